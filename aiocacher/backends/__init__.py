@@ -7,11 +7,18 @@
 # <<
 
 from aiocacher.backends._base import BaseBackend, BackendT
+from aiocacher.backends.memory import MemoryBackend
 from aiocacher.backends.redis import RedisBackend
+from aiocacher.backends.sharded import HashRing, ShardedBackend
+from aiocacher.backends.sqlite import SQLiteBackend
 
 
 __all__ = [
     'BackendT',
     'BaseBackend',
+    'HashRing',
+    'MemoryBackend',
     'RedisBackend',
+    'SQLiteBackend',
+    'ShardedBackend',
 ]
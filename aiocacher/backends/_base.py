@@ -12,11 +12,15 @@ from asyncio import AbstractEventLoop
 from typing import (
     Any,
     Dict,
+    List,
+    Callable,
     Optional,
     Protocol,
     TypeVar,
 )
 
+from aiocacher.types import ManyTTL, ValueTTL
+
 T = TypeVar('T')
 
 __all__ = [
@@ -42,13 +46,19 @@ class BackendT(Protocol):
     async def get(self, key: str, _conn: Any) -> T:
         ...
 
+    async def getmany(self, keys: List[str], _conn: Any) -> List[Optional[T]]:
+        ...
+
+    async def getmany_ttl(self, keys: List[str], _conn: Any) -> List[ValueTTL]:
+        ...
+
     async def set(self, key: str, value: T, ttl: Optional[int], _conn: Any) -> bool:
         ...
 
     async def replace(self, key: str, value: T, ttl: Optional[int], _conn: Any) -> T:
         ...
 
-    async def setmany(self, keys_vals: Dict[str, T], ttl: Optional[int], _conn: Any) -> int:
+    async def setmany(self, keys_vals: Dict[str, T], ttl: ManyTTL, _conn: Any) -> int:
         ...
 
     async def expire(self, key: str, ttl: int, _conn: Any) -> bool:
@@ -63,6 +73,21 @@ class BackendT(Protocol):
     async def clear_namespace(self, global_namespace: str, namespace: str, _conn: Any) -> int:
         ...
 
+    async def incr(self, key: str, _conn: Any) -> int:
+        ...
+
+    async def acquire_lock(self, key: str, token: str, ttl: int, _conn: Any) -> bool:
+        ...
+
+    async def release_lock(self, key: str, token: str, _conn: Any) -> bool:
+        ...
+
+    async def publish(self, channel: str, message: bytes, _conn: Any) -> int:
+        ...
+
+    async def listen(self, channel: str, callback: Callable[[bytes], None]) -> None:
+        ...
+
 
 class BaseBackend:
 
@@ -74,6 +99,29 @@ class BaseBackend:
     def loop(self) -> AbstractEventLoop:
         return self._loop
 
+    async def getmany(self, keys: List[str], **kwargs) -> List[Optional[T]]:
+        """Fallback for backends without a native multi-get."""
+        # noinspection PyUnresolvedReferences
+        return list(await asyncio.gather(*[self.get(k, **kwargs) for k in keys]))
+
+    async def getmany_ttl(self, keys: List[str], **kwargs) -> List[ValueTTL]:
+        """Fetches ``keys`` with the seconds each has left to live, None when it
+        doesn't expire. Fallback for backends that can't tell: no TTL is
+        reported, so a local tier keeps the values up to its ``max_ttl``."""
+        # noinspection PyUnresolvedReferences
+        return [(v, None) for v in await self.getmany(keys, **kwargs)]
+
+    async def acquire_lock(self, key: str, token: str, ttl: int, **kwargs) -> bool:
+        """Backends without cross-process locking always grant the lock; callers
+        still coalesce requests within a single process."""
+        return True
 
+    async def release_lock(self, key: str, token: str, **kwargs) -> bool:
+        return True
 
+    async def publish(self, channel: str, message: bytes, **kwargs) -> int:
+        """Backends without pub/sub have nobody to deliver messages to."""
+        return 0
 
+    async def listen(self, channel: str, callback: Callable[[bytes], None]) -> None:
+        return None
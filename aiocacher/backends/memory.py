@@ -0,0 +1,235 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   async-redis-cache, 2021
+#   LiveViewTech
+# <<
+
+import asyncio
+import heapq
+from asyncio import AbstractEventLoop
+from collections import OrderedDict, defaultdict
+from time import monotonic
+from typing import (
+    Any,
+    Dict,
+    List,
+    Set,
+    Tuple,
+    Callable,
+    Optional,
+)
+
+from aiocacher.types import ManyTTL, ValueTTL
+from aiocacher.utils import key_ttl, namespace_prefix
+from aiocacher.backends._base import BaseBackend
+
+__all__ = [
+    'MemoryBackend',
+]
+
+# how many namespace levels of every key are indexed for ``clear_namespace``
+PREFIX_DEPTH = 2
+
+
+class MemoryBackend(BaseBackend):
+    """A process-local backend for single-process deployments and tests.
+
+    Expiry is tracked in a heap, so expired keys are dropped in order without
+    scanning the keyspace; every key is indexed under its namespace prefixes
+    so ``clear_namespace`` only touches the keys it removes. Once
+    ``max_entries`` is reached the least recently used key is evicted.
+    """
+
+    ENCODING = 'latin-1'
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        loop: Optional[AbstractEventLoop] = None,
+    ):
+        super().__init__(loop=loop)
+        self._max_entries = max_entries
+        self._data: 'OrderedDict[str, Tuple[Any, Optional[float]]]' = OrderedDict()
+        self._expiry: List[Tuple[float, str]] = []
+        self._prefixes: Dict[str, Set[str]] = defaultdict(set)
+        self._subscribers: Dict[str, List[Callable[[bytes], None]]] = defaultdict(list)
+
+    def __len__(self) -> int:
+        self._expire()
+        return len(self._data)
+
+    async def setup(self, loop: AbstractEventLoop, **kwargs) -> None:
+        self._loop = loop
+
+    async def close(self) -> None:
+        ...
+
+    # internals
+
+    @staticmethod
+    def _key_prefixes(key: str) -> List[str]:
+        parts = key.split(':', PREFIX_DEPTH)[:-1]
+        return [':'.join(parts[:i + 1]) + ':' for i in range(len(parts))]
+
+    def _expire(self) -> None:
+        now = monotonic()
+        while self._expiry and self._expiry[0][0] <= now:
+            expires, key = heapq.heappop(self._expiry)
+            entry = self._data.get(key)
+            # the key may have been rewritten with a new TTL since
+            if entry is not None and entry[1] == expires:
+                self._remove(key)
+
+    def _lookup(self, key: str) -> Optional[Any]:
+        return self._lookup_ttl(key)[0]
+
+    def _lookup_ttl(self, key: str) -> ValueTTL:
+        entry = self._data.get(key)
+        if entry is None:
+            return None, None
+        value, expires = entry
+        now = monotonic()
+        if expires is not None and expires <= now:
+            self._remove(key)
+            return None, None
+        self._data.move_to_end(key)
+        return value, expires - now if expires is not None else None
+
+    def _store(self, key: str, value: Any, ttl: Optional[int]) -> None:
+        if key not in self._data:
+            for prefix in self._key_prefixes(key):
+                self._prefixes[prefix].add(key)
+
+        expires = monotonic() + ttl if ttl else None
+        self._data[key] = (value, expires)
+        self._data.move_to_end(key)
+
+        if expires is not None:
+            heapq.heappush(self._expiry, (expires, key))
+            # rewritten keys leave stale heap entries behind, compact them now and then
+            if len(self._expiry) > 2 * len(self._data) + 64:
+                # yapf: disable
+                self._expiry = [
+                    (e, k) for e, k in self._expiry
+                    if k in self._data and self._data[k][1] == e
+                ]
+                # yapf: enable
+                heapq.heapify(self._expiry)
+
+        if self._max_entries is not None:
+            while len(self._data) > self._max_entries:
+                self._remove(next(iter(self._data)))
+
+    def _remove(self, key: str) -> bool:
+        if self._data.pop(key, None) is None:
+            return False
+        for prefix in self._key_prefixes(key):
+            keys = self._prefixes[prefix]
+            keys.discard(key)
+            if not keys:
+                del self._prefixes[prefix]
+        return True
+
+    # BackendT
+
+    async def get(self, key: str, **kwargs) -> Optional[bytes]:
+        self._expire()
+        return self._lookup(key)
+
+    async def getmany(self, keys: List[str], **kwargs) -> List[Optional[bytes]]:
+        self._expire()
+        return [self._lookup(k) for k in keys]
+
+    async def getmany_ttl(self, keys: List[str], **kwargs) -> List[ValueTTL]:
+        self._expire()
+        return [self._lookup_ttl(k) for k in keys]
+
+    async def set(self, key: str, value: bytes, ttl: Optional[int], **kwargs) -> bool:
+        self._expire()
+        self._store(key, value, ttl)
+        return True
+
+    async def replace(self, key: str, value: bytes, ttl: Optional[int], **kwargs) -> bytes:
+        self._expire()
+        old = self._lookup(key)
+        self._store(key, value, ttl)
+        return old
+
+    async def setmany(self, keys_vals: Dict[str, bytes], ttl: ManyTTL, **kwargs) -> int:
+        self._expire()
+        for k, v in keys_vals.items():
+            self._store(k, v, key_ttl(ttl, k))
+        return len(keys_vals)
+
+    async def expire(self, key: str, ttl: int, **kwargs) -> bool:
+        self._expire()
+        value = self._lookup(key)
+        if value is None:
+            return False
+        if ttl <= 0:
+            return self._remove(key)
+        self._store(key, value, ttl)
+        return True
+
+    async def delete(self, key: str, **kwargs) -> bool:
+        self._expire()
+        return self._remove(key)
+
+    async def purge(self, **kwargs) -> None:
+        self._data.clear()
+        self._expiry.clear()
+        self._prefixes.clear()
+
+    async def clear_namespace(self, global_namespace: str, namespace: str, **kwargs) -> int:
+        self._expire()
+        prefix = namespace_prefix(global_namespace, namespace)
+        if prefix.count(':') <= PREFIX_DEPTH:
+            keys = list(self._prefixes.get(prefix, ()))
+        else:
+            # deeper than the index, e.g. a namespace with ':' in it; scan the
+            #  keys under its deepest indexed prefix
+            indexed = ':'.join(prefix.split(':', PREFIX_DEPTH)[:PREFIX_DEPTH]) + ':'
+            keys = [k for k in self._prefixes.get(indexed, ()) if k.startswith(prefix)]
+        for key in keys:
+            self._remove(key)
+        return len(keys)
+
+    async def incr(self, key: str, **kwargs) -> int:
+        self._expire()
+        value = int(self._lookup(key) or 0) + 1
+        if key in self._data:
+            # like Redis, incrementing keeps the key's TTL
+            self._data[key] = (str(value).encode(), self._data[key][1])
+        else:
+            self._store(key, str(value).encode(), None)
+        return value
+
+    async def acquire_lock(self, key: str, token: str, ttl: int, **kwargs) -> bool:
+        self._expire()
+        if self._lookup(key) is not None:
+            return False
+        self._store(key, token, ttl)
+        return True
+
+    async def release_lock(self, key: str, token: str, **kwargs) -> bool:
+        if self._lookup(key) != token:
+            return False
+        return self._remove(key)
+
+    async def publish(self, channel: str, message: bytes, **kwargs) -> int:
+        subscribers = list(self._subscribers.get(channel, ()))
+        for callback in subscribers:
+            try:
+                callback(message)
+            except Exception as e:  # noqa
+                self.logger.exception('handling a message on %s failed: %s', channel, e)
+        return len(subscribers)
+
+    async def listen(self, channel: str, callback: Callable[[bytes], None]) -> None:
+        self._subscribers[channel].append(callback)
+        try:
+            await asyncio.Event().wait()  # until cancelled
+        finally:
+            self._subscribers[channel].remove(callback)
@@ -11,6 +11,7 @@ from asyncio import AbstractEventLoop
 from functools import wraps
 from typing import (
     Dict,
+    List,
     Callable,
     Optional,
 )
@@ -19,12 +20,22 @@ import aioredis
 from aioredis import Redis
 from toolz.itertoolz import partition_all
 
+from aiocacher.types import ManyTTL, ValueTTL
+from aiocacher.utils import key_ttl, namespace_prefix
 from aiocacher.backends import BaseBackend
 
 __all__ = [
     'RedisBackend',
 ]
 
+# only delete the lock if we're still the ones holding it
+RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
 
 def connection(func: Callable):
     """Returns a fresh Redis connection to do operations on."""
@@ -59,6 +70,8 @@ class RedisBackend(BaseBackend):
         pool_maxsize: int = 10,
         connect_timeout: Optional[float] = None,
         client_name: Optional[str] = None,
+        chunk_size: int = 100,
+        concurrency: int = 1,
         loop: Optional[AbstractEventLoop] = None,
     ):
         super().__init__(loop=loop)
@@ -70,6 +83,8 @@ class RedisBackend(BaseBackend):
         self._maxsize = pool_maxsize
         self._conn_timeout = max(0.1, connect_timeout) if connect_timeout else None
         self._client_name = client_name
+        self._chunk_size = max(1, chunk_size)
+        self._concurrency = max(1, concurrency)
 
         self._conn: Optional[Redis] = None
         self._conn_lock = asyncio.Lock()
@@ -109,6 +124,38 @@ class RedisBackend(BaseBackend):
     ) -> bytes:
         return await _conn.get(key)
 
+    @connection
+    async def getmany(
+        self,
+        keys: List[str],
+        _conn: Redis,
+    ) -> List[Optional[bytes]]:
+        async with _conn.pipeline(transaction=False) as pipe:
+            for chunk in partition_all(self._chunk_size, keys):
+                pipe = pipe.mget(chunk)
+            res = await pipe.execute()
+        return [v for chunk in res for v in chunk]
+
+    @connection
+    async def getmany_ttl(
+        self,
+        keys: List[str],
+        _conn: Redis,
+    ) -> List[ValueTTL]:
+        """GET and PTTL every key in one transaction, so each value comes with
+        the TTL it had when it was read."""
+        async with _conn.pipeline(transaction=True) as pipe:
+            for key in keys:
+                pipe = pipe.get(key).pttl(key)
+            res = await pipe.execute()
+        # PTTL is -1 for keys without an expiry
+        # yapf: disable
+        return [
+            (v, max(ms, 1) / 1000 if ms >= 0 else None)
+            for v, ms in zip(res[::2], res[1::2])
+        ]
+        # yapf: enable
+
     @connection
     async def set(
         self,
@@ -139,15 +186,25 @@ class RedisBackend(BaseBackend):
     async def setmany(
         self,
         keys_vals: Dict[str, bytes],
-        ttl: Optional[int],
+        ttl: ManyTTL,
         _conn: Redis,
     ) -> int:
-        for chunk in partition_all(100, keys_vals.items()):
-            await _conn.mset(chunk)
-            async with _conn.pipeline(transaction=True) as pipe:
-                for k, _ in chunk:
-                    pipe = pipe.expire(k, ttl)
-                await pipe.execute()
+        """Writes each chunk as one non-transactional pipeline, so every key gets
+        its TTL, shared or its own, in the same round-trip it is written in."""
+        semaphore = asyncio.Semaphore(self._concurrency)
+
+        async def write(chunk):
+            async with semaphore:
+                async with _conn.pipeline(transaction=False) as pipe:
+                    if ttl:
+                        for k, v in chunk:
+                            pipe = pipe.set(k, v, ex=key_ttl(ttl, k) or None)
+                    else:
+                        pipe = pipe.mset(dict(chunk))
+                    await pipe.execute()
+
+        chunks = partition_all(self._chunk_size, keys_vals.items())
+        await asyncio.gather(*[write(chunk) for chunk in chunks])
         return len(keys_vals)
 
     @connection
@@ -176,7 +233,7 @@ class RedisBackend(BaseBackend):
     ) -> int:
         count = 0
         cursor = b'0'
-        namespace = f'{global_namespace}:{namespace}:'
+        namespace = namespace_prefix(global_namespace, namespace)
         while cursor:
             cursor, keys = await _conn.scan(cursor, match=f'{namespace}*')
             if keys:
@@ -184,3 +241,68 @@ class RedisBackend(BaseBackend):
                 key, *keys = keys
                 await _conn.delete(key, *keys)
         return count
+
+    @connection
+    async def incr(self, key: str, _conn: Redis) -> int:
+        return await _conn.incr(key)
+
+    @connection
+    async def acquire_lock(
+        self,
+        key: str,
+        token: str,
+        ttl: int,
+        _conn: Redis,
+    ) -> bool:
+        return bool(await _conn.set(key, token, ex=ttl, nx=True))
+
+    @connection
+    async def release_lock(
+        self,
+        key: str,
+        token: str,
+        _conn: Redis,
+    ) -> bool:
+        return bool(await _conn.eval(RELEASE_LOCK_SCRIPT, 1, key, token))
+
+    @connection
+    async def publish(
+        self,
+        channel: str,
+        message: bytes,
+        _conn: Redis,
+    ) -> int:
+        return await _conn.publish(channel, message)
+
+    async def listen(
+        self,
+        channel: str,
+        callback: Callable[[bytes], None],
+    ) -> None:
+        """Subscribes to ``channel`` and calls ``callback`` with every message,
+        reconnecting with a capped backoff until cancelled. Errors raised by
+        ``callback`` are logged and the message is skipped."""
+        backoff = 0.1
+
+        while True:
+            conn = await self.get_pool()
+            pubsub = conn.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(channel)
+                async for message in pubsub.listen():
+                    if message['type'] != 'message':
+                        continue
+                    # the subscription works, start over if it drops later
+                    backoff = 0.1
+                    try:
+                        callback(message['data'])
+                    except Exception as e:  # noqa
+                        self.logger.exception('handling a message on %s failed: %s', channel, e)
+                self.logger.warning('subscription to %s ended, resubscribing', channel)
+            except Exception as e:  # noqa
+                self.logger.warning('lost subscription to %s, retrying: %s', channel, e)
+            finally:
+                await pubsub.reset()
+
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 5.0)
@@ -0,0 +1,207 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   async-redis-cache, 2021
+#   LiveViewTech
+# <<
+
+import asyncio
+from asyncio import AbstractEventLoop
+from bisect import bisect, insort
+from collections import defaultdict
+from hashlib import blake2b
+from typing import (
+    Any,
+    Dict,
+    List,
+    Callable,
+    Iterable,
+    Optional,
+    Union,
+)
+
+from aiocacher.types import ManyTTL, ValueTTL
+from aiocacher.backends._base import BaseBackend, BackendT
+
+__all__ = [
+    'HashRing',
+    'ShardedBackend',
+]
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+class HashRing:
+    """Consistent hashing with virtual nodes. Adding or removing a node only moves
+    the keys that node gains or loses, about ``1/N`` of them.
+
+    >>> ring = HashRing(['a', 'b', 'c'])
+    >>> before = {k: ring.node_for(str(k)) for k in range(1000)}
+    >>> ring.add('d')
+    >>> moved = [k for k, n in before.items() if ring.node_for(str(k)) != n]
+    >>> all(ring.node_for(str(k)) == 'd' for k in moved), 150 < len(moved) < 350
+    (True, True)
+    """
+
+    __slots__ = ('_vnodes', '_points', '_owners', '_nodes')
+
+    def __init__(self, nodes: Iterable[str] = (), vnodes: int = 160):
+        self._vnodes = max(1, vnodes)
+        self._points: List[int] = []
+        self._owners: Dict[int, str] = {}
+        self._nodes: List[str] = []
+        for node in nodes:
+            self.add(node)
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    @property
+    def nodes(self) -> List[str]:
+        return list(self._nodes)
+
+    def add(self, node: str) -> None:
+        if node in self._nodes:
+            return
+        self._nodes.append(node)
+        for i in range(self._vnodes):
+            point = _hash(f'{node}#{i}')
+            if point not in self._owners:
+                self._owners[point] = node
+                insort(self._points, point)
+
+    def remove(self, node: str) -> None:
+        if node not in self._nodes:
+            return
+        self._nodes.remove(node)
+        self._points = [p for p in self._points if self._owners[p] != node]
+        self._owners = {p: self._owners[p] for p in self._points}
+
+    def node_for(self, key: str) -> str:
+        if not self._points:
+            raise RuntimeError('the hash ring has no nodes')
+        i = bisect(self._points, _hash(key)) % len(self._points)
+        return self._owners[self._points[i]]
+
+
+class ShardedBackend(BaseBackend):
+    """Spreads keys over several backends, usually one ``RedisBackend`` per node,
+    with client-side consistent hashing.
+
+    Single-key commands go to the key's node. ``getmany``/``setmany`` are split
+    per node and sent concurrently, and ``clear_namespace``/``purge`` run on
+    every node at once. After ``add_node``/``remove_node`` the keys that changed
+    owner read as misses and are recomputed; their old copies simply expire.
+    """
+
+    ENCODING = 'latin-1'
+
+    def __init__(
+        self,
+        backends: Union[Dict[str, BackendT], List[BackendT]],
+        vnodes: int = 160,
+        loop: Optional[AbstractEventLoop] = None,
+    ):
+        super().__init__(loop=loop)
+        if not isinstance(backends, dict):
+            backends = {f'node{i}': b for i, b in enumerate(backends)}
+        self._backends: Dict[str, BackendT] = dict(backends)
+        self._ring = HashRing(self._backends, vnodes=vnodes)
+
+    @property
+    def backends(self) -> Dict[str, BackendT]:
+        return dict(self._backends)
+
+    def add_node(self, name: str, backend: BackendT) -> None:
+        self._backends[name] = backend
+        self._ring.add(name)
+
+    def remove_node(self, name: str) -> BackendT:
+        self._ring.remove(name)
+        return self._backends.pop(name)
+
+    def backend_for(self, key: str) -> BackendT:
+        return self._backends[self._ring.node_for(key)]
+
+    def _group(self, keys: Iterable[str]) -> Dict[str, List[str]]:
+        groups = defaultdict(list)
+        for k in keys:
+            groups[self._ring.node_for(k)].append(k)
+        return groups
+
+    async def _everywhere(self, fn: Callable[[BackendT], 'asyncio.Future']) -> list:
+        return await asyncio.gather(*[fn(b) for b in self._backends.values()])
+
+    async def setup(self, loop: AbstractEventLoop, **kwargs) -> None:
+        self._loop = loop
+        await self._everywhere(lambda b: b.setup(loop, **kwargs))
+
+    async def close(self) -> None:
+        await self._everywhere(lambda b: b.close())
+
+    async def get(self, key: str, **kwargs):
+        return await self.backend_for(key).get(key)
+
+    async def _read(self, keys: List[str], fn: Callable[[BackendT, List[str]], Any]):
+        """Runs the multi-key read ``fn`` on every node with its share of ``keys``
+        and returns the results in the order of ``keys``."""
+        groups = self._group(keys)
+        names = list(groups)
+        results = await asyncio.gather(*[fn(self._backends[n], groups[n]) for n in names])
+        found = {}
+        for name, values in zip(names, results):
+            found.update(zip(groups[name], values))
+        return [found[k] for k in keys]
+
+    async def getmany(self, keys: List[str], **kwargs) -> list:
+        return await self._read(keys, lambda backend, chunk: backend.getmany(chunk))
+
+    async def getmany_ttl(self, keys: List[str], **kwargs) -> List[ValueTTL]:
+        return await self._read(keys, lambda backend, chunk: backend.getmany_ttl(chunk))
+
+    async def set(self, key: str, value: bytes, ttl: Optional[int], **kwargs) -> bool:
+        return await self.backend_for(key).set(key, value, ttl=ttl)
+
+    async def replace(self, key: str, value: bytes, ttl: Optional[int], **kwargs) -> bytes:
+        return await self.backend_for(key).replace(key, value, ttl=ttl)
+
+    async def setmany(self, keys_vals: Dict[str, bytes], ttl: ManyTTL, **kwargs) -> int:
+        groups = self._group(keys_vals)
+        # yapf: disable
+        await asyncio.gather(*[
+            self._backends[n].setmany({k: keys_vals[k] for k in keys}, ttl=ttl)
+            for n, keys in groups.items()
+        ])
+        # yapf: enable
+        return len(keys_vals)
+
+    async def expire(self, key: str, ttl: int, **kwargs) -> bool:
+        return await self.backend_for(key).expire(key, ttl)
+
+    async def delete(self, key: str, **kwargs) -> bool:
+        return await self.backend_for(key).delete(key)
+
+    async def purge(self, **kwargs) -> None:
+        await self._everywhere(lambda b: b.purge())
+
+    async def clear_namespace(self, global_namespace: str, namespace: str, **kwargs) -> int:
+        counts = await self._everywhere(lambda b: b.clear_namespace(global_namespace, namespace))
+        return sum(counts)
+
+    async def incr(self, key: str, **kwargs) -> int:
+        return await self.backend_for(key).incr(key)
+
+    async def acquire_lock(self, key: str, token: str, ttl: int, **kwargs) -> bool:
+        return await self.backend_for(key).acquire_lock(key, token, ttl=ttl)
+
+    async def release_lock(self, key: str, token: str, **kwargs) -> bool:
+        return await self.backend_for(key).release_lock(key, token)
+
+    async def publish(self, channel: str, message: bytes, **kwargs) -> int:
+        return await self.backend_for(channel).publish(channel, message)
+
+    async def listen(self, channel: str, callback: Callable[[bytes], None]) -> None:
+        await self.backend_for(channel).listen(channel, callback)
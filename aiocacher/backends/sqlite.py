@@ -0,0 +1,266 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   async-redis-cache, 2021
+#   LiveViewTech
+# <<
+
+import asyncio
+import sqlite3
+from asyncio import AbstractEventLoop
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from time import time
+from typing import (
+    Any,
+    Dict,
+    List,
+    Callable,
+    Optional,
+)
+
+from toolz.itertoolz import partition_all
+
+from aiocacher.types import ManyTTL, ValueTTL
+from aiocacher.utils import key_ttl, namespace_prefix
+from aiocacher.backends._base import BaseBackend
+
+__all__ = [
+    'SQLiteBackend',
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key     TEXT PRIMARY KEY,
+    value   BLOB NOT NULL,
+    expires REAL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires) WHERE expires IS NOT NULL;
+"""
+
+# SQLite limits the number of bound parameters per statement
+SQLITE_CHUNK = 500
+
+
+def prefix_range(prefix: str) -> tuple:
+    """The half-open key range matching every key that starts with ``prefix``.
+
+    >>> prefix_range('ns:a:')
+    ('ns:a:', 'ns:a;')
+    """
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+class SQLiteBackend(BaseBackend):
+    """A persistent backend stored in a local SQLite database.
+
+    The cache survives restarts and can be shared by every process on a host:
+    the database runs in WAL mode so readers don't block the writer, and pages
+    are read through SQLite's memory-mapped I/O. Expiry times are wall-clock,
+    expired rows are hidden from reads and swept every ``sweep_interval``
+    seconds. All queries run on one dedicated thread to keep the event loop free.
+
+    Pub/sub isn't available, so local tiers in front of it can't broadcast.
+    """
+
+    ENCODING = 'latin-1'
+
+    def __init__(
+        self,
+        path: str,
+        mmap_size: int = 256 * 1024 * 1024,
+        busy_timeout: float = 5.0,
+        sweep_interval: float = 60.0,
+        loop: Optional[AbstractEventLoop] = None,
+    ):
+        super().__init__(loop=loop)
+        self._path = path
+        self._mmap_size = mmap_size
+        self._busy_timeout = busy_timeout
+        self._sweep_interval = sweep_interval
+        self._last_sweep = 0.0
+        self._conn: Optional[sqlite3.Connection] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    async def setup(self, loop: AbstractEventLoop, **kwargs) -> None:
+        await self.close()
+        self._loop = loop
+
+    async def close(self) -> None:
+        if self._executor is None:
+            return
+        await self._run(self._close)
+        self._executor.shutdown(wait=True)
+        self._executor = None
+
+    # internals
+
+    def _connect(self) -> sqlite3.Connection:
+        # only ever called from the executor's single thread
+        if self._conn is None:
+            conn = sqlite3.connect(self._path, timeout=self._busy_timeout, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(f'PRAGMA mmap_size={int(self._mmap_size)}')
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def _close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    async def _run(self, fn: Callable, *args) -> Any:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(1, thread_name_prefix='aiocacher-sqlite')
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self._executor, partial(fn, *args))
+
+    def _write(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        """Runs ``fn`` in an immediate transaction, sweeping expired rows first
+        when it is due."""
+        conn = self._connect()
+        now = time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if now - self._last_sweep >= self._sweep_interval:
+                conn.execute('DELETE FROM cache WHERE expires <= ?', (now,))
+                self._last_sweep = now
+            ret = fn(conn)
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+        return ret
+
+    @staticmethod
+    def _expires(ttl: Optional[int]) -> Optional[float]:
+        return time() + ttl if ttl else None
+
+    def _select(self, conn: sqlite3.Connection, keys: List[str]) -> Dict[str, bytes]:
+        return {k: v for k, (v, _) in self._select_ttl(conn, keys).items()}
+
+    def _select_ttl(self, conn: sqlite3.Connection, keys: List[str]) -> Dict[str, ValueTTL]:
+        found = {}
+        now = time()
+        for chunk in partition_all(SQLITE_CHUNK, keys):
+            rows = conn.execute(
+                'SELECT key, value, expires FROM cache WHERE key IN '
+                f'({",".join("?" * len(chunk))}) AND (expires IS NULL OR expires > ?)',
+                (*chunk, now),
+            )
+            for key, value, expires in rows:
+                found[key] = (value, expires - now if expires is not None else None)
+        return found
+
+    def _upsert(self, conn: sqlite3.Connection, keys_vals: Dict[str, Any], ttl: ManyTTL):
+        conn.executemany(
+            'INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)',
+            ((k, v, self._expires(key_ttl(ttl, k))) for k, v in keys_vals.items()),
+        )
+
+    # BackendT
+
+    async def get(self, key: str, **kwargs) -> Optional[bytes]:
+        return (await self.getmany([key]))[0]
+
+    async def getmany(self, keys: List[str], **kwargs) -> List[Optional[bytes]]:
+
+        return [v for v, _ in await self.getmany_ttl(keys)]
+
+    async def getmany_ttl(self, keys: List[str], **kwargs) -> List[ValueTTL]:
+
+        def op():
+            found = self._select_ttl(self._connect(), keys)
+            return [found.get(k, (None, None)) for k in keys]
+
+        return await self._run(op)
+
+    async def set(self, key: str, value: bytes, ttl: Optional[int], **kwargs) -> bool:
+        await self._run(self._write, lambda conn: self._upsert(conn, {key: value}, ttl))
+        return True
+
+    async def replace(self, key: str, value: bytes, ttl: Optional[int], **kwargs) -> bytes:
+
+        def op(conn):
+            old = self._select(conn, [key]).get(key)
+            self._upsert(conn, {key: value}, ttl)
+            return old
+
+        return await self._run(self._write, op)
+
+    async def setmany(self, keys_vals: Dict[str, bytes], ttl: ManyTTL, **kwargs) -> int:
+        await self._run(self._write, lambda conn: self._upsert(conn, keys_vals, ttl))
+        return len(keys_vals)
+
+    async def expire(self, key: str, ttl: int, **kwargs) -> bool:
+
+        def op(conn):
+            if ttl <= 0:
+                cur = conn.execute('DELETE FROM cache WHERE key = ?', (key,))
+            else:
+                cur = conn.execute(
+                    'UPDATE cache SET expires = ? WHERE key = ? AND (expires IS NULL OR expires > ?)',
+                    (self._expires(ttl), key, time()),
+                )
+            return cur.rowcount > 0
+
+        return await self._run(self._write, op)
+
+    async def delete(self, key: str, **kwargs) -> bool:
+
+        def op(conn):
+            cur = conn.execute(
+                'DELETE FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)',
+                (key, time()),
+            )
+            return cur.rowcount > 0
+
+        return await self._run(self._write, op)
+
+    async def purge(self, **kwargs) -> None:
+        await self._run(self._write, lambda conn: conn.execute('DELETE FROM cache'))
+
+    async def clear_namespace(self, global_namespace: str, namespace: str, **kwargs) -> int:
+        lo, hi = prefix_range(namespace_prefix(global_namespace, namespace))
+
+        def op(conn):
+            # a range over the primary key, instead of LIKE, so it's one index seek
+            cur = conn.execute('DELETE FROM cache WHERE key >= ? AND key < ?', (lo, hi))
+            return cur.rowcount
+
+        return await self._run(self._write, op)
+
+    async def incr(self, key: str, **kwargs) -> int:
+
+        def op(conn):
+            value = int(self._select(conn, [key]).get(key) or 0) + 1
+            conn.execute(
+                'INSERT INTO cache (key, value, expires) VALUES (?, ?, NULL) '
+                'ON CONFLICT (key) DO UPDATE SET value = excluded.value, '
+                'expires = CASE WHEN expires <= ? THEN NULL ELSE expires END',
+                (key, str(value).encode(), time()),
+            )
+            return value
+
+        return await self._run(self._write, op)
+
+    async def acquire_lock(self, key: str, token: str, ttl: int, **kwargs) -> bool:
+
+        def op(conn):
+            if self._select(conn, [key]):
+                return False
+            self._upsert(conn, {key: token}, ttl)
+            return True
+
+        return await self._run(self._write, op)
+
+    async def release_lock(self, key: str, token: str, **kwargs) -> bool:
+
+        def op(conn):
+            cur = conn.execute('DELETE FROM cache WHERE key = ? AND value = ?', (key, token))
+            return cur.rowcount > 0
+
+        return await self._run(self._write, op)
@@ -12,21 +12,47 @@ This is the main documentation for cache.py
 """
 
 import asyncio
-from time import monotonic
+import math
+import random
+import struct
+from time import time, monotonic, perf_counter
+from contextvars import ContextVar
+from uuid import uuid4
 from asyncio import AbstractEventLoop
-from logging import getLogger
-from functools import wraps
+from concurrent.futures import Executor
+from logging import DEBUG, getLogger
+import inspect
+from functools import wraps, update_wrapper
+from weakref import WeakSet
 from typing import (
     Any,
+    Set,
     Dict,
     List,
+    Tuple,
+    Callable,
+    Awaitable,
+    Iterable,
     Optional,
     TypeVar,
+    NamedTuple,
+    Union,
 )
 
-from aiocacher.types import KeyBuildFn, TimeT
-from aiocacher.utils import trim_key, default_key_builder, convert_ttl
-from aiocacher.plugins import PluginT
+from aiocacher.types import KeyBuildFn, TimeT, TTLFn
+from aiocacher.local import LocalCache, Invalidator
+from aiocacher.offload import OFFLOAD_THRESHOLD, Offloader
+from aiocacher.writebehind import MAX_PENDING, WRITE_DELAY, WriteBehind
+from aiocacher.utils import (
+    StripedLock,
+    trim_key,
+    key_plan,
+    namespace_prefix,
+    default_key_builder,
+    convert_ttl,
+    key_ttl,
+)
+from aiocacher.plugins import Operation, PluginT
 from aiocacher.backends import BackendT
 from aiocacher.serializers import SerializerT, DillSerializer
 
@@ -34,39 +60,129 @@ UNSET = object()
 MISSING = object()
 GLOBAL_TTL = object()
 NO_CACHE = object()
+LOCK_POLL_INTERVAL = 0.05
+# Stored in place of a serialized None, so a cached None reads back as a hit.
+#  It starts with the compression MAGIC byte followed by a codec byte no
+#  serializer writes, so it can't be mistaken for a real payload.
+TOMBSTONE = b'\xc1\xfe'
+# Prefixes an ``Entry`` written as a binary header, its creation time and cost
+#  as two doubles, followed by the serialized value; the metadata stays out of
+#  the serializer, so an envelope round-trips through JSON or msgpack too.
+ENVELOPE = b'\xc1\xfd'
+ENTRY_HEADER = struct.Struct('!dd')
+ENTRY_OFFSET = len(ENVELOPE) + ENTRY_HEADER.size
+PLUGIN_HOOKS = (
+    'before_first_call',
+    'on_cache_hit',
+    'on_cache_miss',
+    'before_call',
+    'after_call',
+    'after_compute',
+    'on_operation',
+    'on_teardown',
+)
 T = TypeVar('T')
 
+# the operation being measured for ``on_operation`` hooks, if any
+_operation: ContextVar[Optional[Operation]] = ContextVar('operation', default=None)
+
+
+class Entry(NamedTuple):
+    """Envelope stored by ``cached()`` when it needs to know how old a value is
+    and how long it took to compute, for stale-while-revalidate and early refresh."""
+    value: Any
+    created: float
+    cost: float
+
+
+def _pack_entry(entry: Entry, data: bytes) -> bytes:
+    return ENVELOPE + ENTRY_HEADER.pack(entry.created, entry.cost) + data
+
+
+def _is_entry(raw: Optional[bytes]) -> bool:
+    return raw is not None and raw[:2] == ENVELOPE
+
+
+def _payload(value: Any) -> Any:
+    return value.value if type(value) is Entry else value
+
+
+class _Deadline:
+    """Cancels ``task`` once the timeout elapses; cheaper than ``wait_for``, which
+    wraps every call in a new task."""
+
+    __slots__ = ('task', 'expired')
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.expired = False
+
+    def __call__(self) -> None:
+        self.expired = True
+        self.task.cancel()
+
 
 def timeout(func):
     """Enforces the global timeout from the cache instance."""
 
     @wraps(func)
     async def wrapped(self, *args, **kwargs):
-        fut = func(self, *args, **kwargs)
-        return await asyncio.wait_for(
-            fut,
-            timeout=self.global_timeout,
-        )
+        task = asyncio.current_task()
+        if task is None or not hasattr(task, 'uncancel'):
+            # before 3.11 our cancellation can't be told apart from one racing it
+            return await asyncio.wait_for(func(self, *args, **kwargs), self.global_timeout)
+
+        deadline = _Deadline(task)
+        cancelling = task.cancelling()
+        handle = asyncio.get_running_loop().call_later(self.global_timeout, deadline)
+        try:
+            return await func(self, *args, **kwargs)
+        except asyncio.CancelledError:
+            if not deadline.expired:
+                raise
+            # like ``asyncio.timeout``, only convert our own cancellation: when
+            #  another cancel landed too, the count is still above the one on entry
+            if task.uncancel() > cancelling:
+                raise
+            raise asyncio.TimeoutError() from None
+        finally:
+            handle.cancel()
 
     return wrapped
 
 
 def locked(func):
-    """Locks the Cache interface to perform only one SET-like operation at a time."""
+    """Serializes SET-like operations on the same key(s) while writes to unrelated
+    keys run concurrently. The first argument is a key or a dict keyed by keys;
+    bulk writes of many keys are not serialized, see ``StripedLock``."""
 
     @wraps(func)
     async def wrapped(self, *args, **kwargs):
-        async with self.lock:
+        keys = args[0] if args else kwargs.get('key', kwargs.get('keys_vals'))
+        async with self.locks(keys):
             return await func(self, *args, **kwargs)
 
     return wrapped
 
 
 def logged(func):
-    """Logs the operation and how long it took to complete."""
+    """Logs the operation and how long it took to complete, and reports its
+    measurements to plugins implementing ``on_operation``. Private variants of
+    an operation, like ``_get``, are reported under its public name."""
+    op = func.__name__.lstrip('_').upper()
 
     @wraps(func)
     async def wrapped(self, *args, **kwargs):
+        if self._hooks['on_operation']:
+            return await self._measured(func, args, kwargs)
+
+        if not self.logger.isEnabledFor(DEBUG):
+            try:
+                return await func(self, *args, **kwargs)
+            except Exception as e:
+                self.logger.exception(e)
+                raise e
+
         start = monotonic()
         try:
             ret = await func(self, *args, **kwargs)
@@ -74,24 +190,81 @@ def logged(func):
             self.logger.exception(e)
             raise e
         else:
-            self.logger.debug(
-                '%s %s (took=%0.4f)',
-                func.__name__.upper(),
-                ret,
-                monotonic() - start,
-            )
+            self.logger.debug('%s %s (took=%0.4f)', op, ret, monotonic() - start)
             return ret
 
     return wrapped
 
 
+async def _timed_io(op: Operation, fut) -> Any:
+    start = perf_counter()
+    try:
+        return await fut
+    finally:
+        op.backend += perf_counter() - start
+
+
+def _as_args(call: Any) -> Tuple[Any, ...]:
+    return call if isinstance(call, tuple) else (call,)
+
+
+class CachedFunction:
+    """What ``cached()`` returns: the caching coroutine function, plus ``many``
+    to resolve a batch of calls at once. Looked up on an instance, both are
+    bound to it like a method, so ``obj.method.many([...])`` passes ``obj``."""
+
+    # recognized by ``asyncio.iscoroutinefunction``
+    _is_coroutine = getattr(asyncio.coroutines, '_is_coroutine', None)
+
+    def __init__(self, fn_cache: 'FnCache', func: Callable, call: Callable):
+        update_wrapper(self, func)
+        self._fn_cache = fn_cache
+        self._func = func
+        self._call = call
+        if hasattr(inspect, 'markcoroutinefunction'):
+            inspect.markcoroutinefunction(self)
+
+    def __call__(self, *args, **kwargs) -> Awaitable[Any]:
+        return self._call(*args, **kwargs)
+
+    def __get__(self, instance: Any, owner: Optional[type] = None):
+        if instance is None:
+            return self
+        return BoundCachedFunction(self, instance)
+
+    async def many(self, calls: Iterable[Any]) -> List[Any]:
+        return await self._fn_cache.many(self._func, calls)
+
+
+class BoundCachedFunction:
+    """A ``CachedFunction`` bound to ``__self__``."""
+
+    __slots__ = ('__func__', '__self__')
+
+    def __init__(self, func: CachedFunction, instance: Any):
+        self.__func__ = func
+        self.__self__ = instance
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.__func__, name)
+
+    def __call__(self, *args, **kwargs) -> Awaitable[Any]:
+        return self.__func__._call(self.__self__, *args, **kwargs)
+
+    async def many(self, calls: Iterable[Any]) -> List[Any]:
+        # yapf: disable
+        calls = [(self.__self__, *_as_args(call)) for call in calls]
+        # yapf: enable
+        return await self.__func__.many(calls)
+
+
 class FnCache:
 
     def __init__(
         self,
         cache: 'Cache',
         key: Optional[str],
-        ttl: Optional[TimeT],
+        ttl: Union[Optional[TimeT], TTLFn],
         key_builder: Optional[KeyBuildFn],
         namespace: Optional[str],
         as_last_arg: bool = False,
@@ -99,9 +272,17 @@ class FnCache:
         use_plugins: bool = True,
         omit_self: bool = True,
         cache_none: bool = True,
+        coalesce: bool = False,
+        coalesce_lock: Optional[TimeT] = None,
+        stale_ttl: Optional[TimeT] = None,
+        xfetch: Optional[float] = None,
+        negative_ttl: Optional[TimeT] = None,
+        ttl_jitter: float = 0.0,
     ):
         if key_builder and not callable(key_builder):
             raise RuntimeError('key_builder must be callable')
+        if not 0.0 <= ttl_jitter < 1.0:
+            raise RuntimeError('ttl_jitter must be a fraction in [0, 1)')
 
         self._key = key
         self._ttl = ttl
@@ -114,10 +295,23 @@ class FnCache:
         self._called = False
         self._omit_self = omit_self
         self._cache_none = cache_none
+        self._negative_ttl = negative_ttl
+        self._ttl_jitter = ttl_jitter
+        self._coalesce_lock = max(1, convert_ttl(coalesce_lock)) if coalesce_lock else None
+        self._coalesce = coalesce or self._coalesce_lock is not None
+        self._plans: Dict[Any, Callable] = {}
+        self._stale_ttl = convert_ttl(stale_ttl)
+        self._xfetch = xfetch
+        self._envelope = self._stale_ttl is not None or bool(xfetch)
+        # background refreshes, kept so they aren't collected mid-run and so
+        #  ``Cache.close()`` can cancel them
+        self._refreshes: Set[asyncio.Future] = set()
+        cache._fn_caches.add(self)
 
+    # noinspection PyProtectedMember
     @property
     def use_plugins(self) -> bool:
-        if not self.cache.plugins:
+        if not self.cache._plugins:
             return False
         return self._use_plugins
 
@@ -126,31 +320,46 @@ class FnCache:
         if not asyncio.iscoroutinefunction(func):
             raise RuntimeError('caching only works on coroutine functions')
 
+        if self._key_builder is default_key_builder:
+            # analyse the signature once instead of on every call
+            self._plans[func] = key_plan(func)
+
         # noinspection PyProtectedMember
         @wraps(func)
         async def wrapped(*args, **kwargs):
-            if not self._called and self.use_plugins:
-                await self.cache._before_first_call()
+            if not self.use_plugins:
+                return await self.decorator(func, *args, **kwargs)
+
+            cache = self.cache
+
+            if not self._called:
                 self._called = True
+                pending = cache._run_hooks('before_first_call')
+                if pending is not None:
+                    await pending
 
-            if self.use_plugins:
-                await self.cache._before_call()
+            pending = cache._run_hooks('before_call')
+            if pending is not None:
+                await pending
 
             res = await self.decorator(func, *args, **kwargs)
 
-            if self.use_plugins:
-                res = await self.cache._after_call(res)
+            if 'after_call' in cache._async_hooks:
+                return await cache._after_call_async(res)
+            return cache._after_call(res)
 
-            return res
-
-        return wrapped
+        return CachedFunction(self, func, wrapped)
 
     def get_cache_key(self, func, args, kwargs) -> str:
         k = None
+        plan = self._plans.get(func)
 
         if self._key:
             k = self._key
 
+        elif plan is not None:
+            return plan(args[1:] if self._omit_self and args else args, kwargs)
+
         elif self._key_builder:
             if self._omit_self and args:
                 # we don't want to pass `self`, the first instance parameter of `func`
@@ -165,44 +374,270 @@ class FnCache:
             k = f'{func.__module__ or ""}_{func.__qualname__}'
 
         if k:
-            return trim_key(k)
+            return str(k)
 
         return default_key_builder(func, args, kwargs)
 
     # noinspection PyProtectedMember
     async def decorator(self, fn, *args, **kwargs) -> Any:
+        if self._namespace is not None and self.cache.generations:
+            await self.cache.refresh_generation(self._namespace)
+
         key = self.get_cache_key(fn, args, kwargs)
         key = self.cache.build_key(key, namespace=self._namespace)
 
         # look for the value in the cache
-        value = await self.cache.get(key, default=MISSING)
+        value = await self.cache._get(key, default=MISSING)
 
         if value is not MISSING:
             if self.use_plugins:
-                await self.cache._on_cache_hit(key)
+                pending = self.cache._run_hooks('on_cache_hit', key)
+                if pending is not None:
+                    await pending
+            # the envelope may have been written by another function sharing the
+            #  key, or before ``stale_ttl``/``xfetch`` were turned off
+            if type(value) is Entry:
+                if self._envelope and self._should_refresh(value):
+                    self._refresh(key, fn, args, kwargs)
+                return value.value
             return value
 
         else:
             if self.use_plugins:
-                await self.cache._on_cache_miss(key)
+                pending = self.cache._run_hooks('on_cache_miss', key)
+                if pending is not None:
+                    await pending
+
+        if self._coalesce:
+            return await self._coalesced(key, fn, args, kwargs)
+        return await self._compute(key, fn, args, kwargs)
 
+    # noinspection PyProtectedMember
+    async def many(self, fn, calls: Iterable[Any]) -> List[Any]:
+        """Resolves a batch of calls with one multi-get. Each item of ``calls`` is
+        a tuple of positional arguments, or a single argument. Misses are
+        computed concurrently and written back with one ``setmany``. Stale hits
+        are refreshed and plugins see every call, as if each was made alone."""
+        calls: List[Tuple[Any, ...]] = [_as_args(c) for c in calls]
+        cache = self.cache
+
+        if self.use_plugins:
+            if not self._called:
+                self._called = True
+                pending = cache._run_hooks('before_first_call')
+                if pending is not None:
+                    await pending
+            for _ in calls:
+                pending = cache._run_hooks('before_call')
+                if pending is not None:
+                    await pending
+
+        if self._namespace is not None and self.cache.generations:
+            await self.cache.refresh_generation(self._namespace)
+
+        keys = [
+            self.cache.build_key(self.get_cache_key(fn, args, {}), namespace=self._namespace)
+            for args in calls
+        ]
+        found = await self.cache._getmany(keys, default=MISSING)
+        todo = {k: args for k, args in zip(keys, calls) if found[k] is MISSING}
+
+        if self.use_plugins:
+            for k in keys:
+                hook = 'on_cache_miss' if k in todo else 'on_cache_hit'
+                pending = self.cache._run_hooks(hook, k)
+                if pending is not None:
+                    await pending
+
+        if self._envelope:
+            for k, args in zip(keys, calls):
+                value = found[k]
+                if type(value) is Entry and self._should_refresh(value):
+                    self._refresh(k, fn, args, {})
+
+        if todo:
+            timed = await asyncio.gather(*[self._timed_call(fn, args, {}) for args in todo.values()])
+            results = [result for result, _ in timed]
+
+            if self.use_plugins:
+                for (k, args), (_, cost) in zip(todo.items(), timed):
+                    pending = self.cache._run_hooks('after_compute', k, fn, args, {}, cost)
+                    if pending is not None:
+                        await pending
+
+            found.update(zip(todo, results))
+
+            fresh: Dict[str, Any] = {}
+            ttls: Dict[str, Optional[int]] = {}
+            for k, (result, cost) in zip(todo, timed):
+                if self._cacheable(result):
+                    fresh[k] = self._wrap(result, cost)
+                    ttls[k] = self._ttl_for(result, cost)
+
+            if self._wait_for_write:
+                if fresh:
+                    await self.cache.setmany(fresh, ttl=ttls)
+            else:
+                for k, value in fresh.items():
+                    await self.cache._write_behind.put(k, value, ttls[k])
+
+        results = [_payload(found[k]) for k in keys]
+
+        if self.use_plugins:
+            if 'after_call' in cache._async_hooks:
+                return [await cache._after_call_async(result) for result in results]
+            return [cache._after_call(result) for result in results]
+        return results
+
+    def _cacheable(self, result: Any) -> bool:
+        return result is not NO_CACHE and (result is not None or self._cache_none)
+
+    def _base_ttl(self, result: Any, cost: float) -> Optional[int]:
+        if result is None and self._negative_ttl is not None:
+            return convert_ttl(self._negative_ttl)
+        if callable(self._ttl):
+            return convert_ttl(self._ttl(result, cost))
+        return convert_ttl(self._ttl)
+
+    def _ttl_for(self, result: Any, cost: float) -> Optional[int]:
+        """The TTL to write ``result`` with, spread by ``ttl_jitter`` so keys
+        written together do not all expire in the same second."""
+        ttl = self._base_ttl(result, cost)
+        if not ttl or not self._ttl_jitter:
+            return ttl
+        return max(1, round(ttl * (1.0 + random.uniform(-self._ttl_jitter, self._ttl_jitter))))
+
+    def _wrap(self, result: Any, cost: float) -> Any:
+        # None is stored bare so it is written as the compact tombstone
+        if self._envelope and result is not None:
+            return Entry(result, time(), cost)
+        return result
+
+    def _should_refresh(self, entry: Entry) -> bool:
+        age = time() - entry.created
+
+        if self._stale_ttl is not None and age >= self._stale_ttl:
+            return True
+
+        ttl = self._base_ttl(entry.value, entry.cost)
+
+        if self._xfetch and ttl:
+            # the shortest expiry jitter may have given the value
+            ttl *= 1.0 - self._ttl_jitter
+            # XFetch (Vattani et al.): refresh early with a probability that rises
+            #  as the hard expiry approaches, scaled by how expensive the value is.
+            return age - entry.cost * self._xfetch * math.log(1.0 - random.random()) >= ttl
+
+        return False
+
+    # noinspection PyProtectedMember
+    def _refresh(self, key: str, fn, args, kwargs) -> None:
+        """Recomputes ``key`` in the background while the stale value is served."""
+        if key in self.cache._inflight:
+            return
+
+        def done(task: asyncio.Future):
+            self._refreshes.discard(task)
+            if not task.cancelled() and task.exception() is not None:
+                self.cache.logger.error('refreshing %s failed: %r', key, task.exception())
+
+        task = asyncio.ensure_future(self._coalesced(key, fn, args, kwargs), loop=self.cache.loop)
+        self._refreshes.add(task)
+        task.add_done_callback(done)
+
+    async def cancel_refreshes(self) -> None:
+        """Cancels the background refreshes still running and waits for them."""
+        tasks = list(self._refreshes)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _call(self, fn, args, kwargs) -> Any:
         if self._as_last_arg:
-            fut = fn(*args, self.cache, **kwargs)
-        else:
-            fut = fn(*args, **kwargs)
+            return await fn(*args, self.cache, **kwargs)
+        return await fn(*args, **kwargs)
 
-        result = await fut
+    async def _timed_call(self, fn, args, kwargs) -> Tuple[Any, float]:
+        start = monotonic()
+        result = await self._call(fn, args, kwargs)
+        return result, monotonic() - start
 
-        if result is not NO_CACHE:
-            w_fut = self.cache.set(key, result, ttl=self._ttl)
+    # noinspection PyProtectedMember
+    async def _compute(self, key: str, fn, args, kwargs) -> Any:
+        result, cost = await self._timed_call(fn, args, kwargs)
+
+        if self.use_plugins:
+            pending = self.cache._run_hooks('after_compute', key, fn, args, kwargs, cost)
+            if pending is not None:
+                await pending
+
+        if self._cacheable(result):
+            value, ttl = self._wrap(result, cost), self._ttl_for(result, cost)
 
             if self._wait_for_write:
-                await w_fut
+                await self.cache.set(key, value, ttl=ttl)
             else:
-                asyncio.ensure_future(w_fut, loop=self.cache.loop)
+                await self.cache._write_behind.put(key, value, ttl)
 
         return result
 
+    # noinspection PyProtectedMember
+    async def _coalesced(self, key: str, fn, args, kwargs) -> Any:
+        """Single-flight: concurrent misses on ``key`` await one computation."""
+        inflight = self.cache._inflight
+
+        while key in inflight:
+            fut = inflight[key]
+            try:
+                return await asyncio.shield(fut)
+            except asyncio.CancelledError:
+                # the leader was cancelled, not us; try to become the new leader
+                if not fut.cancelled():
+                    raise
+
+        fut = self.cache.loop.create_future()
+        inflight[key] = fut
+
+        try:
+            if self._coalesce_lock:
+                result = await self._compute_locked(key, fn, args, kwargs)
+            else:
+                result = await self._compute(key, fn, args, kwargs)
+        except asyncio.CancelledError:
+            fut.cancel()
+            raise
+        except BaseException as e:
+            fut.set_exception(e)
+            fut.exception()  # mark retrieved, there may be no waiters
+            raise
+        else:
+            fut.set_result(result)
+            return result
+        finally:
+            if inflight.get(key) is fut:
+                del inflight[key]
+
+    async def _compute_locked(self, key: str, fn, args, kwargs) -> Any:
+        """Cross-process single-flight using a short-lived lock in the backend."""
+        token = uuid4().hex
+
+        if await self.cache.acquire_lock(key, token, ttl=self._coalesce_lock):
+            try:
+                return await self._compute(key, fn, args, kwargs)
+            finally:
+                await self.cache.release_lock(key, token)
+
+        # another process is computing the value; wait for it to land in the
+        #  cache, or for its lock to expire, before computing it ourselves.
+        deadline = monotonic() + self._coalesce_lock
+        while monotonic() < deadline:
+            await asyncio.sleep(LOCK_POLL_INTERVAL)
+            value = await self.cache.get(key, default=MISSING)
+            if value is not MISSING:
+                return value
+
+        return await self._compute(key, fn, args, kwargs)
+
 
 class Cache:
 
@@ -216,17 +651,47 @@ class Cache:
         global_timeout: TimeT = 5,
         global_ttl:     Optional[TimeT] = None,
         key_builder:    Optional[KeyBuildFn] = None,
+        local:          Optional[LocalCache] = None,
+        broadcast:      bool = False,
+        generations:    bool = False,
+        generation_ttl: float = 1.0,
+        offload_threshold: Optional[int] = None,
+        executor:       Optional[Executor] = None,
+        write_delay:    float = WRITE_DELAY,
+        max_pending_writes: int = MAX_PENDING,
     ):
         # yapf: enable
         self._backend = backend
+        self._offload: Optional[Offloader] = None
+        self._fn_caches: 'WeakSet[FnCache]' = WeakSet()
+        self._write_behind = WriteBehind(self, delay=write_delay, max_pending=max_pending_writes)
+        self._local = local
+        self._use_generations = generations
+        self._generation_ttl = generation_ttl
+        self._generations: Dict[str, Tuple[int, float]] = {}
+        self._invalidator: Optional[Invalidator] = None
+
+        if local is not None and broadcast:
+            self._invalidator = Invalidator(
+                backend,
+                local,
+                channel=f'aiocacher:invalidate:{namespace or ""}',
+            )
+
+        if offload_threshold is not None or executor is not None:
+            self._offload = Offloader(offload_threshold or OFFLOAD_THRESHOLD, executor)
 
         ns = f'.{namespace}' if namespace else ''
         self.logger = getLogger(f'{__file__}.{self.__class__.__name__}{ns}')
-        self.lock = asyncio.Lock()
+        self.locks = StripedLock()
+        self._inflight: Dict[str, asyncio.Future] = {}
 
         self._namespace = namespace
         self._serializer = serializer or DillSerializer()
-        self._plugins = plugins or list()
+        self._plugins = list(plugins or ())
+        self._hooks: Dict[str, List[Callable]] = {}
+        self._async_hooks: Set[str] = set()
+        self._build_hooks()
         self._g_timeout = max(1, convert_ttl(global_timeout))
         self._g_ttl = max(1, convert_ttl(global_ttl)) if global_ttl else None
         self._key_builder = key_builder or default_key_builder
@@ -240,20 +705,54 @@ class Cache:
         return self._g_timeout
 
     @property
-    def plugins(self) -> List[PluginT]:
-        return self._plugins
+    def plugins(self) -> Tuple[PluginT, ...]:
+        """The installed plugins, read-only: add them with ``add_plugin`` so
+        their hooks are picked up."""
+        return tuple(self._plugins)
+
+    @property
+    def local(self) -> Optional[LocalCache]:
+        return self._local
 
     def set_backend(self, backend: BackendT) -> None:
         self._backend = backend
-        self.lock = asyncio.Lock(loop=self._backend.loop)
+        if self._invalidator is not None:
+            self._invalidator.backend = backend
 
     def add_plugin(self, plugin: PluginT):
         self.logger.debug(f'adding {plugin}')
         self._plugins.append(plugin)
+        self._build_hooks()
+
+    def _build_hooks(self) -> None:
+        """Resolves, once, which plugins implement each hook and whether any of
+        them must be awaited, so hooks nobody implements cost nothing and sync
+        hooks run without creating coroutines. Plugins must be added through
+        ``add_plugin``."""
+        # yapf: disable
+        self._hooks = {
+            name: [
+                getattr(plugin, name) for plugin in self._plugins
+                if callable(getattr(plugin, name, None))
+            ]
+            for name in PLUGIN_HOOKS
+        }
+        self._async_hooks = {
+            name for name, hooks in self._hooks.items()
+            if any(asyncio.iscoroutinefunction(hook) for hook in hooks)
+        }
+        # yapf: enable
 
     async def close(self) -> None:
         self.logger.debug('shutting down')
-        await self._on_teardown()
+        for fn_cache in list(self._fn_caches):
+            await fn_cache.cancel_refreshes()
+        await self._write_behind.flush()
+        pending = self._run_hooks('on_teardown')
+        if pending is not None:
+            await pending
+        if self._invalidator is not None:
+            await self._invalidator.close()
         await self._backend.close()
 
     def _get_ttl(self, ttl: Optional[TimeT]) -> Optional[int]:
@@ -261,26 +760,105 @@ class Cache:
             return self._g_ttl
         return convert_ttl(ttl)
 
+    @property
+    def generations(self) -> bool:
+        return self._use_generations
+
     def build_key(self, key: str, namespace: Optional[str] = None) -> str:
-        if namespace is not None:
-            k = f'{namespace}:{key}'
-        elif self._namespace:
-            k = f'{self._namespace}:{key}'
+        """Prefixes ``key`` with ``namespace`` when given, or else with the global
+        namespace, which is how every key reaches the backend.
+
+        Keys longer than ``MAX_KEYLEN`` are shortened by ``trim_key``, which keeps
+        the namespaces intact, so ``clear_namespace`` still matches them, and
+        replaces the overflow with a digest so long keys can't collide.
+        """
+        if namespace is not None and self._use_generations:
+            gen, _ = self._generations.get(namespace, (0, 0))
+            return f'{namespace}:g{gen}:{key}'
+        elif namespace is not None:
+            return f'{namespace}:{key}'
+
+        # the first segment of the key is its namespace, see ``clear_namespace``
+        ns, sep, _ = str(key).partition(':')
+        keep = len(ns) + 1 if sep else 0
+        if self._namespace:
+            return trim_key(f'{self._namespace}:{key}', keep=len(self._namespace) + 1 + keep)
+        return trim_key(key, keep=keep)
+
+    def _local_set(self, key: str, value: Any, size: int, ttl: Optional[int]) -> None:
+        if self._local is None:
+            return
+        self._local.set(key, value, size=size, ttl=ttl)
+        if self._invalidator is not None:
+            self._invalidator.invalidate(key)
+
+    def _local_delete(self, key: str) -> None:
+        if self._local is None:
+            return
+        self._local.delete(key)
+        if self._invalidator is not None:
+            self._invalidator.invalidate(key)
+
+    def _local_clear(self, prefix: Optional[str] = None) -> None:
+        if self._local is None:
+            return
+        if prefix is None:
+            self._local.clear()
+            if self._invalidator is not None:
+                self._invalidator.invalidate_all()
         else:
-            k = key
-        return trim_key(k)
+            self._local.clear_prefix(prefix)
+            if self._invalidator is not None:
+                self._invalidator.invalidate_prefix(prefix)
 
     def cached(
         self,
         key: Optional[str] = None,
-        ttl: Optional[TimeT] = None,
+        ttl: Union[Optional[TimeT], TTLFn] = None,
         namespace: Optional[str] = None,
         key_builder: Optional[KeyBuildFn] = None,
         as_last_arg: bool = False,
         wait_for_write: bool = True,
         use_plugins: bool = True,
         omit_self: bool = True,
+        coalesce: bool = False,
+        coalesce_lock: Optional[TimeT] = None,
+        stale_ttl: Optional[TimeT] = None,
+        xfetch: Optional[float] = None,
+        cache_none: bool = True,
+        negative_ttl: Optional[TimeT] = None,
+        ttl_jitter: float = 0.0,
     ) -> FnCache:
+        """Decorates a coroutine function so its results are cached.
+
+        When ``coalesce`` is set, concurrent misses on the same key within this
+        process await a single call to the wrapped function. Passing a
+        ``coalesce_lock`` TTL also takes a short-lived lock in the backend so
+        only one process across the fleet recomputes the value; the others
+        wait for it to be written, up to the lock TTL.
+
+        ``ttl`` is the hard expiry of a value in the backend, or a callable
+        ``ttl(result, elapsed)`` that picks one from the result and the seconds
+        it took to compute, so expensive or stable results can live longer.
+        ``ttl_jitter`` spreads every TTL by a random fraction, 0.1 for +/-10%, so
+        keys written together do not all expire at once. With ``stale_ttl``
+        (a soft TTL shorter than ``ttl``) older values are still returned right
+        away, while a background task recomputes them. ``xfetch`` is the beta of
+        XFetch probabilistic early expiration: values are refreshed in the
+        background before the hard expiry, earlier the more expensive they were
+        to compute; 1.0 is a good default. Both keep the age and cost of a value
+        in a small binary header in front of its serialized bytes.
+
+        A result of None is cached too, as a compact tombstone, so "not found"
+        lookups hit instead of recomputing every time; ``negative_ttl`` gives
+        them their own, usually shorter, TTL. Set ``cache_none=False`` to never
+        cache None.
+
+        With ``wait_for_write=False`` a miss returns without waiting for its
+        write: results are queued and written in batches every ``write_delay``
+        seconds of the cache, at most ``max_pending_writes`` at a time, and
+        ``close()`` writes out whatever is still queued.
+        """
         return FnCache(
             cache=self,  # backref
             key=key,
@@ -291,28 +869,111 @@ class Cache:
             wait_for_write=wait_for_write,
             use_plugins=use_plugins,
             omit_self=omit_self,
+            coalesce=coalesce,
+            coalesce_lock=coalesce_lock,
+            stale_ttl=stale_ttl,
+            xfetch=xfetch,
+            cache_none=cache_none,
+            negative_ttl=negative_ttl,
+            ttl_jitter=ttl_jitter,
         )
 
+    async def get(
+        self,
+        key: str,
+        default=UNSET,
+    ):
+        return _payload(await self._get(key, default))
+
     @logged
     @timeout
-    async def get(
+    async def _get(
         self,
         key: str,
         default=UNSET,
     ):
+        """Like ``get``, but returns the ``Entry`` envelopes written by ``cached()``
+        as they are, for its refresh decisions."""
         key = self.build_key(key)
-        val = await self._backend.get(key)
-        val = self._serializer.loads(val)
 
-        # handle None-like sentinel value for cached None values
-        if val is not None:
-            return val
+        if self._local is not None:
+            if self._invalidator is not None:
+                self._invalidator.start()
+            val = self._local.get(key, MISSING)
+            if val is not MISSING:
+                return val
+
+        if self._local is None:
+            raw, ttl = await self._io(self._backend.get(key)), None
+        else:
+            # the local copy must not outlive the key in the backend
+            (raw, ttl), = await self._io(self._backend.getmany_ttl([key]))
+
+        if raw is not None:
+            val = self._loads(raw) if self._offload is None else await self._loads_async(raw)
+
+            # None is only a value when it was stored as the tombstone
+            if val is not None or raw == TOMBSTONE:
+                if self._local is not None:
+                    self._local.set(key, val, size=len(raw), ttl=ttl)
+                return val
 
         if default is UNSET:
             return None
 
         return default
 
+    async def getmany(
+        self,
+        keys: Iterable[str],
+        default=UNSET,
+    ) -> Dict[str, Any]:
+        """Fetches many keys at once, returning a dict keyed by the given keys."""
+        found = await self._getmany(keys, default)
+        return {k: _payload(v) for k, v in found.items()}
+
+    @logged
+    @timeout
+    async def _getmany(
+        self,
+        keys: Iterable[str],
+        default=UNSET,
+    ) -> Dict[str, Any]:
+        default = None if default is UNSET else default
+        built = {self.build_key(k): k for k in keys}
+        out: Dict[str, Any] = {}
+        remote: List[str] = []
+
+        if self._local is not None:
+            if self._invalidator is not None:
+                self._invalidator.start()
+            for k in built:
+                val = self._local.get(k, MISSING)
+                if val is MISSING:
+                    remote.append(k)
+                else:
+                    out[built[k]] = val
+        else:
+            remote = list(built)
+
+        if remote:
+            if self._local is None:
+                raws = await self._io(self._backend.getmany(remote))
+                ttls = [None] * len(raws)
+            else:
+                raws, ttls = zip(*await self._io(self._backend.getmany_ttl(remote)))
+            vals = await self._loads_many(list(raws))
+            for k, raw, ttl, val in zip(remote, raws, ttls, vals):
+                if val is None and raw != TOMBSTONE:
+                    out[built[k]] = default
+                    continue
+                if self._local is not None:
+                    self._local.set(k, val, size=len(raw), ttl=ttl)
+                out[built[k]] = val
+
+        # keep the caller's ordering regardless of which tier answered
+        return {k: out[k] for k in built.values()}
+
     @logged
     @timeout
     @locked
@@ -323,9 +984,10 @@ class Cache:
         ttl: Optional[TimeT] = GLOBAL_TTL,
     ) -> Any:
         key = self.build_key(key)
-        val = self._serializer.dumps(value)
+        val = self._dumps(value) if self._offload is None else await self._dumps_async(value)
         ttl = self._get_ttl(ttl)
-        res = await self._backend.set(key, val, ttl=ttl)
+        res = await self._io(self._backend.set(key, val, ttl=ttl))
+        self._local_set(key, value, size=len(val), ttl=ttl)
         return res
 
     @logged
@@ -334,16 +996,31 @@ class Cache:
     async def setmany(
         self,
         keys_vals: Dict[str, Any],
-        ttl: Optional[TimeT] = GLOBAL_TTL,
+        ttl: Union[Optional[TimeT], Dict[str, Optional[TimeT]]] = GLOBAL_TTL,
     ):
+        """Writes all of ``keys_vals`` at once, with one ``ttl`` or a dict of
+        TTLs per key; keys missing from the dict get the global TTL."""
         # yapf: disable
-        keys_vals = {
-            self.build_key(k): self._serializer.dumps(v)
+        values = {
+            self.build_key(k): v
             for k, v in keys_vals.items()
         }
+        if isinstance(ttl, dict):
+            ttl = {
+                bk: self._get_ttl(ttl.get(k, GLOBAL_TTL))
+                for bk, k in zip(values, keys_vals)
+            }
+        else:
+            ttl = self._get_ttl(ttl)
         # yapf: enable
-        ttl = self._get_ttl(ttl)
-        res = await self._backend.setmany(keys_vals, ttl=ttl)
+        raws = await self._dumps_many(list(values.values()))
+        op = _operation.get()
+        if op is not None:
+            op.key_sizes = {k: len(raw) for k, raw in zip(keys_vals, raws)}
+        keys_vals = dict(zip(values, raws))
+        res = await self._io(self._backend.setmany(keys_vals, ttl=ttl))
+        for k, v in values.items():
+            self._local_set(k, v, size=len(keys_vals[k]), ttl=key_ttl(ttl, k))
         return res
 
     @logged
@@ -356,10 +1033,12 @@ class Cache:
         ttl: Optional[TimeT] = GLOBAL_TTL,
     ) -> Any:
         key = self.build_key(key)
-        val = self._serializer.dumps(value)
+        val = self._dumps(value) if self._offload is None else await self._dumps_async(value)
         ttl = self._get_ttl(ttl)
-        res = await self._backend.replace(key, val, ttl=ttl)
-        res = self._serializer.loads(res)
+        res = await self._io(self._backend.replace(key, val, ttl=ttl))
+        res = self._loads(res) if self._offload is None else await self._loads_async(res)
+        res = _payload(res)
+        self._local_set(key, value, size=len(val), ttl=ttl)
         return res
 
     @logged
@@ -371,52 +1050,250 @@ class Cache:
     ) -> Any:
         key = self.build_key(key)
         ttl = convert_ttl(ttl)
-        res = await self._backend.expire(key, ttl)
+        res = await self._io(self._backend.expire(key, ttl))
+        self._local_delete(key)
         return res
 
     @logged
     @timeout
-    @locked
     async def delete(self, key: str) -> bool:
+        # before taking the key's lock: the batch being written may need it
+        await self._write_behind.discard(key)
+        return await self._delete(key)
+
+    @locked
+    async def _delete(self, key: str) -> bool:
         key = self.build_key(key)
-        res = await self._backend.delete(key)
+        res = await self._io(self._backend.delete(key))
+        self._local_delete(key)
         return res
 
     @logged
     @timeout
-    @locked
     async def purge(self) -> None:
-        await self._backend.purge()
+        """Removes every key; writes racing with a purge are last-write-wins."""
+        self._local_clear()
+        await self._write_behind.clear()
+        await self._io(self._backend.purge())
 
     @logged
     @timeout
-    @locked
-    async def clear_namespace(self, namespace: str) -> int:
-        return await self._backend.clear_namespace(self._namespace, namespace)
+    async def clear_namespace(self, namespace: str, scan: bool = False) -> int:
+        """Removes every key in ``namespace`` and returns how many were deleted;
+        writes racing with it are last-write-wins.
+
+        With ``generations`` enabled this is a single ``INCR`` of the namespace
+        generation instead of a scan: ``cached()`` functions in every process
+        stop reading the old keys right away, and those expire on their own, so
+        0 is returned. Keys written without a generation, by ``set('ns:...')``
+        or by ``cached()`` without ``namespace=``, are not reached that way;
+        pass ``scan=True`` to also delete every key under the prefix."""
+        self._local_clear(namespace_prefix(self._namespace, namespace))
+        await self._write_behind.discard_prefix(f'{namespace}:')
+        if self._use_generations:
+            gen = await self._io(self._backend.incr(self._generation_key(namespace)))
+            self._generations[namespace] = (gen, monotonic())
+            if not scan:
+                return 0
+        return await self._io(self._backend.clear_namespace(self._namespace, namespace))
+
+    def _generation_key(self, namespace: str) -> str:
+        return self.build_key(f'__generation__:{namespace}')
+
+    async def refresh_generation(self, namespace: str) -> int:
+        """Makes sure the locally known generation of ``namespace`` is at most
+        ``generation_ttl`` seconds old, and returns it."""
+        gen, fetched = self._generations.get(namespace, (0, None))
+        now = monotonic()
+
+        if fetched is None or now - fetched >= self._generation_ttl:
+            gen = await self._fetch_generation(namespace)
+            self._generations[namespace] = (gen, now)
+
+        return gen
 
-    # plugin helpers
+    @timeout
+    async def _fetch_generation(self, namespace: str) -> int:
+        raw = await self._io(self._backend.get(self._generation_key(namespace)))
+        return int(raw) if raw else 0
 
-    async def _before_first_call(self) -> None:
-        for plugin in self.plugins:
-            await plugin.before_first_call()
+    def _lock_key(self, key: str) -> str:
+        return self.build_key(f'__lock__:{key}')
 
-    async def _on_cache_hit(self, key: str) -> None:
-        for plugin in self.plugins:
-            await plugin.on_cache_hit(key)
+    @logged
+    @timeout
+    async def acquire_lock(self, key: str, token: str, ttl: TimeT) -> bool:
+        ttl = max(1, convert_ttl(ttl))
+        key = self._lock_key(key)
+        return await self._io(self._backend.acquire_lock(key, token, ttl=ttl))
 
-    async def _on_cache_miss(self, key: str) -> None:
-        for plugin in self.plugins:
-            await plugin.on_cache_miss(key)
+    @logged
+    @timeout
+    async def release_lock(self, key: str, token: str) -> bool:
+        return await self._io(self._backend.release_lock(self._lock_key(key), token))
+
+    # measurements
+
+    def _io(self, fut):
+        """Times an awaitable backend call when an operation is being measured."""
+        op = _operation.get()
+        return fut if op is None else _timed_io(op, fut)
+
+    def _dumps(self, value: Any) -> bytes:
+        if value is None:
+            return TOMBSTONE
+        if type(value) is Entry:
+            return _pack_entry(value, self._dumps(value.value))
+        op = _operation.get()
+        if op is None:
+            return self._serializer.dumps(value)
+        start = perf_counter()
+        data = self._serializer.dumps(value)
+        op.serialize += perf_counter() - start
+        op.bytes_out += len(data)
+        return data
+
+    def _loads(self, raw: Optional[bytes]) -> Any:
+        if raw is None or raw == TOMBSTONE:
+            return None
+        if _is_entry(raw):
+            created, cost = ENTRY_HEADER.unpack_from(raw, len(ENVELOPE))
+            return Entry(self._loads(raw[ENTRY_OFFSET:]), created, cost)
+        op = _operation.get()
+        if op is None:
+            return self._serializer.loads(raw)
+        start = perf_counter()
+        val = self._serializer.loads(raw)
+        op.serialize += perf_counter() - start
+        op.bytes_in += len(raw) if raw else 0
+        return val
+
+    # serialization off the event loop, see ``Offloader``
+
+    async def _dumps_async(self, value: Any) -> bytes:
+        if type(value) is Entry:
+            return _pack_entry(value, await self._dumps_async(value.value))
+
+        offload = self._offload
+
+        if offload.offload_dumps(value):
+            start = perf_counter()
+            data = await offload.run(self._serializer.dumps, value)
+            op = _operation.get()
+            if op is not None:
+                op.serialize += perf_counter() - start
+                op.bytes_out += len(data)
+        else:
+            data = self._dumps(value)
+
+        offload.observe(value, len(data))
+        return data
+
+    async def _loads_async(self, raw: Optional[bytes]) -> Any:
+        if _is_entry(raw):
+            created, cost = ENTRY_HEADER.unpack_from(raw, len(ENVELOPE))
+            return Entry(await self._loads_async(raw[ENTRY_OFFSET:]), created, cost)
+
+        offload = self._offload
+
+        if not offload.offload_loads(raw):
+            return self._loads(raw)
+
+        start = perf_counter()
+        val = await offload.run(self._serializer.loads, raw)
+        op = _operation.get()
+        if op is not None:
+            op.serialize += perf_counter() - start
+            op.bytes_in += len(raw)
+        return val
+
+    async def _dumps_many(self, values: List[Any]) -> List[bytes]:
+        if self._offload is None:
+            return [self._dumps(v) for v in values]
+
+        # small values inline, large ones concurrently in the executor
+        out = [None] * len(values)
+        large = []
+        for i, v in enumerate(values):
+            if self._offload.offload_dumps(_payload(v)):
+                large.append(i)
+            else:
+                out[i] = self._dumps(v)
+                if v is not None:
+                    self._offload.observe(_payload(v), len(out[i]))
+
+        if large:
+            encoded = await asyncio.gather(*[self._dumps_async(values[i]) for i in large])
+            for i, data in zip(large, encoded):
+                out[i] = data
+        return out
+
+    async def _loads_many(self, raws: List[Optional[bytes]]) -> List[Any]:
+        if self._offload is None:
+            return [self._loads(raw) for raw in raws]
+
+        out = [None] * len(raws)
+        large = []
+        for i, raw in enumerate(raws):
+            if self._offload.offload_loads(raw):
+                large.append(i)
+            else:
+                out[i] = self._loads(raw)
+
+        if large:
+            decoded = await asyncio.gather(*[self._loads_async(raws[i]) for i in large])
+            for i, val in zip(large, decoded):
+                out[i] = val
+        return out
+
+    async def _measured(self, func: Callable, args: tuple, kwargs: dict) -> Any:
+        key = args[0] if args else kwargs.get('key')
+        op = Operation(func.__name__.lstrip('_'), key if isinstance(key, str) else None)
+        token = _operation.set(op)
+        start = perf_counter()
+        try:
+            return await func(self, *args, **kwargs)
+        except asyncio.TimeoutError:
+            op.timed_out = True
+            raise
+        except Exception as e:
+            op.error = type(e).__name__
+            self.logger.exception(e)
+            raise
+        finally:
+            op.total = perf_counter() - start
+            _operation.reset(token)
+            pending = self._run_hooks('on_operation', op)
+            if pending is not None:
+                await pending
+
+    # plugin helpers
 
-    async def _before_call(self) -> None:
-        for plugin in self.plugins:
-            await plugin.before_call()
+    def _run_hooks(self, name: str, *args) -> Optional[Awaitable[None]]:
+        """Calls every plugin's ``name`` hook in order. Returns an awaitable that
+        finishes the job when one of them is a coroutine function, else None."""
+        if name in self._async_hooks:
+            return self._run_hooks_async(name, args)
+        for hook in self._hooks[name]:
+            hook(*args)
+        return None
+
+    async def _run_hooks_async(self, name: str, args: tuple) -> None:
+        for hook in self._hooks[name]:
+            if asyncio.iscoroutinefunction(hook):
+                await hook(*args)
+            else:
+                hook(*args)
 
-    async def _after_call(self, result: T) -> T:
-        for plugin in self.plugins:
-            result = await plugin.after_call(result)
+    def _after_call(self, result: T) -> T:
+        for hook in self._hooks['after_call']:
+            result = hook(result)
         return result
 
-    async def _on_teardown(self) -> None:
-        for plugin in self.plugins:
-            await plugin.on_teardown()
+    async def _after_call_async(self, result: T) -> T:
+        for hook in self._hooks['after_call']:
+            if asyncio.iscoroutinefunction(hook):
+                result = await hook(result)
+            else:
+                result = hook(result)
+        return result
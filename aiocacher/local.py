@@ -0,0 +1,271 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   async-redis-cache, 2021
+#   LiveViewTech
+# <<
+
+"""local.py
+
+An in-process memory tier that sits between ``Cache`` and its backend. It
+keeps deserialized values so repeated reads skip both the network round-trip
+and the serializer.
+
+Invalidation rules, applied by ``Cache`` on the local copy:
+
+- ``set``, ``setmany`` and ``replace`` write through, storing the new value;
+- values read from the backend are kept no longer than their remaining TTL
+  there, so a key expires locally when it does in the backend;
+- ``expire`` and ``delete`` evict the key;
+- ``clear_namespace`` evicts every key under the namespace prefix;
+- ``purge`` empties the tier.
+
+Values are shared, not copied, so cached objects should be treated as
+immutable by callers.
+
+When several processes each keep a local tier, an ``Invalidator`` broadcasts
+those evictions over the backend's pub/sub channel so every process drops
+its stale copies.
+"""
+
+import asyncio
+import json
+from collections import OrderedDict
+from logging import getLogger
+from time import monotonic
+from uuid import uuid4
+from typing import (
+    Any,
+    Set,
+    Optional,
+    Tuple,
+)
+
+from aiocacher.types import TimeT
+from aiocacher.utils import convert_ttl
+from aiocacher.backends import BackendT
+
+__all__ = [
+    'Invalidator',
+    'LocalCache',
+]
+
+
+class LocalCache:
+    """Bounded LRU of deserialized values with a per-entry TTL cap.
+
+    >>> local = LocalCache(max_entries=2)
+    >>> local.set('a', 1, size=1)
+    >>> local.set('b', 2, size=1)
+    >>> local.get('a')
+    1
+    >>> local.set('c', 3, size=1)
+    >>> local.get('b') is None
+    True
+    >>> local.hits, local.misses, local.evictions
+    (1, 1, 1)
+    """
+
+    __slots__ = (
+        '_entries',
+        '_size',
+        '_max_entries',
+        '_max_size',
+        '_max_ttl',
+        'hits',
+        'misses',
+        'evictions',
+    )
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        max_size: Optional[int] = None,
+        max_ttl: Optional[TimeT] = 60,
+    ):
+        self._entries: 'OrderedDict[str, Tuple[Any, Optional[float], int]]' = OrderedDict()
+        self._size = 0
+        self._max_entries = max(1, max_entries)
+        self._max_size = max_size
+        self._max_ttl = convert_ttl(max_ttl) if max_ttl else None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    @property
+    def size(self) -> int:
+        """Total size in bytes of the serialized payloads held locally."""
+        return self._size
+
+    def get(self, key: str, default=None) -> Any:
+        entry = self._entries.get(key)
+
+        if entry is None:
+            self.misses += 1
+            return default
+
+        value, expires, _ = entry
+
+        if expires is not None and expires <= monotonic():
+            self.delete(key)
+            self.misses += 1
+            return default
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any, size: int, ttl: Optional[float] = None) -> None:
+        if self._max_size is not None and size > self._max_size:
+            # never let a single value flush the whole tier
+            self.delete(key)
+            return
+
+        if ttl and self._max_ttl:
+            ttl = min(ttl, self._max_ttl)
+        else:
+            ttl = ttl or self._max_ttl
+
+        self.delete(key)
+        self._entries[key] = (value, monotonic() + ttl if ttl else None, size)
+        self._size += size
+
+        while len(self._entries) > self._max_entries or (
+            self._max_size is not None and self._size > self._max_size
+        ):
+            _, (_, _, evicted) = self._entries.popitem(last=False)
+            self._size -= evicted
+            self.evictions += 1
+
+    def delete(self, key: str) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self._size -= entry[2]
+        return True
+
+    def clear_prefix(self, prefix: str) -> int:
+        keys = [k for k in self._entries if k.startswith(prefix)]
+        for k in keys:
+            self.delete(k)
+        return len(keys)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._size = 0
+
+
+class Invalidator:
+    """Broadcasts local-tier invalidations to, and applies them from, other processes.
+
+    Invalidations are batched for ``interval`` seconds and published as one
+    message. Messages sent by this process are ignored when they come back.
+    """
+
+    def __init__(
+        self,
+        backend: BackendT,
+        local: LocalCache,
+        channel: str,
+        interval: float = 0.01,
+    ):
+        self.logger = getLogger(f'aiocacher.local.{self.__class__.__name__}')
+        self.backend = backend
+        self.channel = channel
+
+        self._local = local
+        self._interval = interval
+        self._id = uuid4().hex
+        self._keys: Set[str] = set()
+        self._prefixes: Set[str] = set()
+        self._everything = False
+        self._flusher: Optional[asyncio.Task] = None
+        self._listener: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Subscribes to the channel, or subscribes again if the listener has
+        stopped; must be called with a running event loop."""
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.ensure_future(
+                self.backend.listen(self.channel, self._on_message),
+                loop=self.backend.loop,
+            )
+            self._listener.add_done_callback(self._on_listener_done)
+
+    def _on_listener_done(self, task: asyncio.Future) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            self.logger.error('invalidation listener stopped: %r', task.exception())
+
+    async def close(self) -> None:
+        await self.flush()
+        for task in (self._flusher, self._listener):
+            if task is not None and not task.done():
+                task.cancel()
+        self._flusher = self._listener = None
+
+    def invalidate(self, key: str) -> None:
+        self._keys.add(key)
+        self._schedule()
+
+    def invalidate_prefix(self, prefix: str) -> None:
+        self._prefixes.add(prefix)
+        self._schedule()
+
+    def invalidate_all(self) -> None:
+        self._everything = True
+        self._schedule()
+
+    def _schedule(self) -> None:
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.ensure_future(self._flush_later(), loop=self.backend.loop)
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self._interval)
+        await self.flush()
+
+    async def flush(self) -> None:
+        if not (self._keys or self._prefixes or self._everything):
+            return
+
+        # yapf: disable
+        message = json.dumps({
+            'src': self._id,
+            'keys': list(self._keys),
+            'prefixes': list(self._prefixes),
+            'all': self._everything,
+        })
+        # yapf: enable
+        self._keys, self._prefixes, self._everything = set(), set(), False
+
+        try:
+            await self.backend.publish(self.channel, message.encode('utf-8'))
+        except Exception as e:
+            self.logger.warning('could not publish invalidations: %s', e)
+
+    def _on_message(self, message: bytes) -> None:
+        try:
+            data = json.loads(message)
+        except ValueError:
+            data = None
+        if not isinstance(data, dict):
+            self.logger.warning('ignoring malformed invalidation %r', message)
+            return
+
+        if data.get('src') == self._id:
+            return
+
+        if data.get('all'):
+            self._local.clear()
+            return
+
+        for key in data.get('keys', ()):
+            self._local.delete(key)
+        for prefix in data.get('prefixes', ()):
+            self._local.clear_prefix(prefix)
@@ -0,0 +1,102 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   async-redis-cache, 2021
+#   LiveViewTech
+# <<
+
+"""offload.py
+
+Decides which payloads ``Cache`` serializes off the event loop. Small payloads
+are cheaper inline than the hand-off to another thread, large ones would
+stall every other coroutine while they are encoded or decoded.
+
+The size of a payload to decode is known; the size a value will encode to is
+estimated from what earlier values of the same type encoded to, per item for
+sized containers. Until a type has been seen, containers are assumed to take
+``ITEM_SIZE`` bytes per item and other objects are encoded inline.
+"""
+
+import asyncio
+from concurrent.futures import Executor
+from typing import (
+    Any,
+    Dict,
+    Callable,
+    Optional,
+)
+
+__all__ = [
+    'Offloader',
+]
+
+# payloads of at least this many bytes are serialized in the executor
+OFFLOAD_THRESHOLD = 256 * 1024
+
+# how many value types have their encoded size tracked
+MAX_TYPES = 1024
+
+# assumed encoded bytes per item of a container type not seen yet
+ITEM_SIZE = 16
+
+
+class Offloader:
+    """Runs ``dumps``/``loads`` of large payloads in ``executor``, or the loop's
+    default executor when it is None.
+
+    With a ``ProcessPoolExecutor`` the serializer must be picklable.
+
+    >>> offload = Offloader(threshold=1000)
+    >>> offload.offload_loads(b'x' * 10), offload.offload_loads(b'x' * 1000)
+    (False, True)
+    >>> offload.offload_dumps([0] * 10), offload.offload_dumps([0] * 100)
+    (False, True)
+    >>> offload.observe([0] * 500, size=1000)
+    >>> offload.offload_dumps([0] * 100), offload.offload_dumps([0] * 600)
+    (False, True)
+    """
+
+    __slots__ = ('threshold', 'executor', '_ratios')
+
+    def __init__(
+        self,
+        threshold: int = OFFLOAD_THRESHOLD,
+        executor: Optional[Executor] = None,
+    ):
+        self.threshold = threshold
+        self.executor = executor
+        self._ratios: Dict[type, float] = {}
+
+    def offload_loads(self, raw: Optional[bytes]) -> bool:
+        return raw is not None and len(raw) >= self.threshold
+
+    def offload_dumps(self, value: Any) -> bool:
+        if isinstance(value, (bytes, bytearray, str, memoryview)):
+            return len(value) >= self.threshold
+
+        ratio = self._ratios.get(type(value))
+
+        try:
+            return (ratio or ITEM_SIZE) * max(1, len(value)) >= self.threshold
+        except TypeError:
+            return ratio is not None and ratio >= self.threshold
+
+    def observe(self, value: Any, size: int) -> None:
+        """Learns from ``value`` having encoded to ``size`` bytes."""
+        try:
+            ratio = size / max(1, len(value))
+        except TypeError:
+            ratio = float(size)
+
+        kind = type(value)
+        previous = self._ratios.get(kind)
+
+        if previous is None and len(self._ratios) >= MAX_TYPES:
+            self._ratios.clear()
+
+        # an average over the last few values, to follow drifting shapes
+        self._ratios[kind] = ratio if previous is None else (previous + ratio) / 2
+
+    async def run(self, fn: Callable[[Any], Any], arg: Any) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, arg)
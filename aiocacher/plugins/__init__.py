@@ -6,10 +6,11 @@
 #   LiveViewTech
 # <<
 
-from aiocacher.plugins._base import PluginT
+from aiocacher.plugins._base import Operation, PluginT
 
 
 __all__ = [
+    'Operation',
     'PluginT',
 ]
 
@@ -6,31 +6,102 @@
 #   LiveViewTech
 # <<
 
-from typing import Protocol, TypeVar
+from typing import (
+    Any,
+    Dict,
+    Tuple,
+    Callable,
+    Optional,
+    Protocol,
+    TypeVar,
+)
 
 T = TypeVar('T')
 
 __all__ = [
+    'Operation',
     'PluginT',
 ]
 
 
+class Operation:
+    """Measurements of one ``Cache`` operation, passed to ``on_operation``.
+
+    Times are in seconds: ``backend`` is spent awaiting the backend,
+    ``serialize`` in ``dumps``/``loads`` and ``total`` in the whole call,
+    including locks. ``bytes_in`` are read from the backend and ``bytes_out``
+    written to it. ``key`` is set for single-key operations, and ``key_sizes``
+    has the bytes written per key by ``setmany``.
+    """
+
+    __slots__ = (
+        'name',
+        'key',
+        'total',
+        'backend',
+        'serialize',
+        'bytes_in',
+        'bytes_out',
+        'key_sizes',
+        'timed_out',
+        'error',
+    )
+
+    def __init__(self, name: str, key: Optional[str] = None):
+        self.name = name
+        self.key = key
+        self.total = 0.0
+        self.backend = 0.0
+        self.serialize = 0.0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.key_sizes: Optional[Dict[str, int]] = None
+        self.timed_out = False
+        self.error: Optional[str] = None
+
+    def __repr__(self) -> str:
+        return (
+            f'<Operation {self.name} total={self.total:.6f} backend={self.backend:.6f} '
+            f'serialize={self.serialize:.6f} in={self.bytes_in} out={self.bytes_out}>'
+        )
+
+
 class PluginT(Protocol):
+    """Hooks ``Cache`` calls on its plugins.
+
+    Every hook is optional: only the ones a plugin defines are ever called.
+    Hooks may be plain functions, which run inline at no extra cost, or
+    coroutine functions, which are awaited; keep ``async def`` for hooks that
+    really do I/O.
+    """
+
+    def before_first_call(self):
+        ...
+
+    def on_cache_hit(self, key: str):
+        ...
 
-    async def before_first_call(self):
+    def on_cache_miss(self, key: str):
         ...
 
-    async def on_cache_hit(self, key: str):
+    def before_call(self):
         ...
 
-    async def on_cache_miss(self, key: str):
+    def after_call(self, result: T) -> T:
         ...
 
-    async def before_call(self):
+    def after_compute(
+        self,
+        key: str,
+        fn: Callable,
+        args: Tuple[Any, ...],
+        kwargs: Dict[str, Any],
+        elapsed: float,
+    ):
         ...
 
-    async def after_call(self, result: T) -> T:
+    def on_operation(self, op: Operation):
         ...
 
-    async def on_teardown(self):
+    def on_teardown(self):
         ...
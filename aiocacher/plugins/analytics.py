@@ -0,0 +1,218 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   async-redis-cache, 2021
+#   LiveViewTech
+# <<
+
+"""analytics.py
+
+Which cached functions and keys drive load and memory, in bounded memory:
+
+- the hottest keys, estimated with the Space-Saving algorithm;
+- per-function misses and the time the wrapped coroutine took on a miss;
+- per-namespace hits, misses and the distribution of written value sizes.
+
+``AnalyticsPlugin.snapshot()`` returns all of it as plain, JSON-serializable
+data for a debug endpoint.
+"""
+
+import heapq
+from typing import (
+    Any,
+    Dict,
+    List,
+    Tuple,
+    Callable,
+    Optional,
+)
+
+from aiocacher.plugins._base import Operation
+from aiocacher.plugins.stats import Histogram, LATENCY_BUCKETS
+
+__all__ = [
+    'AnalyticsPlugin',
+    'SpaceSaving',
+]
+
+# upper bounds in bytes, powers of 4 from 64B to 64MB
+SIZE_BUCKETS = tuple(float(64 * 4**i) for i in range(11))
+
+OTHER = '<other>'
+
+
+class SpaceSaving:
+    """Approximate top-k counter over an unbounded stream using ``capacity``
+    slots (Metwally et al.). Any item seen more than ``total / capacity`` times
+    is guaranteed to be tracked; ``error`` bounds how much a count is
+    overestimated.
+
+    >>> top = SpaceSaving(2)
+    >>> for item in 'aababcaaa':
+    ...     top.offer(item)
+    >>> [(item, count) for item, count, _ in top.top(2)]
+    [('a', 6), ('c', 3)]
+    """
+
+    __slots__ = ('capacity', '_counts', '_heap')
+
+    def __init__(self, capacity: int = 100):
+        self.capacity = max(1, capacity)
+        self._counts: Dict[str, List[int]] = {}
+        # min-heap of (count, item); counts only grow, so an entry lower than
+        #  the item's current count is stale and refreshed when it surfaces
+        self._heap: List[Tuple[int, str]] = []
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def __contains__(self, item: str) -> bool:
+        return item in self._counts
+
+    def offer(self, item: str) -> None:
+        slot = self._counts.get(item)
+
+        if slot is not None:
+            slot[0] += 1
+            return
+
+        if len(self._counts) < self.capacity:
+            self._counts[item] = [1, 0]
+            heapq.heappush(self._heap, (1, item))
+            return
+
+        while True:
+            count, victim = heapq.heappop(self._heap)
+            current = self._counts[victim][0]
+            if current == count:
+                break
+            heapq.heappush(self._heap, (current, victim))
+
+        del self._counts[victim]
+        self._counts[item] = [count + 1, count]
+        heapq.heappush(self._heap, (count + 1, item))
+
+    def top(self, n: Optional[int] = None) -> List[Tuple[str, int, int]]:
+        """The ``n`` most frequent items as ``(item, count, error)``."""
+        ranked = sorted(self._counts.items(), key=lambda kv: kv[1][0], reverse=True)
+        return [(item, count, error) for item, (count, error) in ranked[:n]]
+
+
+class _FunctionStats:
+
+    __slots__ = ('misses', 'cost')
+
+    def __init__(self):
+        self.misses = 0
+        self.cost = Histogram(LATENCY_BUCKETS)
+
+
+class _NamespaceStats:
+
+    __slots__ = ('hits', 'misses', 'sizes')
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.sizes = Histogram(SIZE_BUCKETS)
+
+
+def _histogram(h: Histogram) -> Dict[str, Any]:
+    # yapf: disable
+    return {
+        'count': h.count,
+        'sum': h.sum,
+        'p50': h.quantile(0.5),
+        'p99': h.quantile(0.99),
+        'buckets': {
+            ('+Inf' if i == len(h.bounds) else repr(h.bounds[i])): n
+            for i, n in enumerate(h.buckets) if n
+        },
+    }
+    # yapf: enable
+
+
+class AnalyticsPlugin:
+    """Tracks hot keys, per-function miss cost and per-namespace value sizes.
+
+    Memory is bounded by ``top_keys`` tracked keys, ``max_functions`` functions
+    and ``max_namespaces`` namespaces; once a table is full, further functions
+    or namespaces are folded into a shared ``<other>`` entry.
+    """
+
+    __slots__ = ('_keys', '_functions', '_namespaces', '_max_functions', '_max_namespaces')
+
+    def __init__(
+        self,
+        top_keys: int = 100,
+        max_functions: int = 256,
+        max_namespaces: int = 256,
+    ):
+        self._keys = SpaceSaving(top_keys)
+        self._functions: Dict[str, _FunctionStats] = {}
+        self._namespaces: Dict[str, _NamespaceStats] = {}
+        self._max_functions = max_functions
+        self._max_namespaces = max_namespaces
+
+    @staticmethod
+    def _namespace_of(key: str) -> str:
+        ns, sep, _ = key.partition(':')
+        return ns if sep else ''
+
+    def _function(self, fn: Callable) -> _FunctionStats:
+        name = f'{getattr(fn, "__module__", None) or ""}.{fn.__qualname__}'
+        stats = self._functions.get(name)
+        if stats is None:
+            if len(self._functions) >= self._max_functions:
+                name = OTHER
+            stats = self._functions.setdefault(name, _FunctionStats())
+        return stats
+
+    def _namespace(self, key: str) -> _NamespaceStats:
+        name = self._namespace_of(key)
+        stats = self._namespaces.get(name)
+        if stats is None:
+            if len(self._namespaces) >= self._max_namespaces:
+                name = OTHER
+            stats = self._namespaces.setdefault(name, _NamespaceStats())
+        return stats
+
+    def on_cache_hit(self, key: str):
+        self._keys.offer(key)
+        self._namespace(key).hits += 1
+
+    def on_cache_miss(self, key: str):
+        self._keys.offer(key)
+        self._namespace(key).misses += 1
+
+    def after_compute(self, key: str, fn: Callable, args, kwargs, elapsed: float):
+        stats = self._function(fn)
+        stats.misses += 1
+        stats.cost.record(elapsed)
+
+    def on_operation(self, op: Operation):
+        if op.key is not None and op.bytes_out and op.name in ('set', 'replace'):
+            self._namespace(op.key).sizes.record(op.bytes_out)
+        elif op.key_sizes:
+            for key, size in op.key_sizes.items():
+                self._namespace(key).sizes.record(size)
+
+    def snapshot(self, top: Optional[int] = None) -> Dict[str, Any]:
+        """Everything collected so far, as JSON-serializable data."""
+        # yapf: disable
+        return {
+            'hot_keys': [
+                {'key': key, 'count': count, 'error': error}
+                for key, count, error in self._keys.top(top)
+            ],
+            'functions': {
+                name: {'misses': st.misses, 'miss_cost': _histogram(st.cost)}
+                for name, st in self._functions.items()
+            },
+            'namespaces': {
+                name: {'hits': st.hits, 'misses': st.misses, 'sizes': _histogram(st.sizes)}
+                for name, st in self._namespaces.items()
+            },
+        }
+        # yapf: enable
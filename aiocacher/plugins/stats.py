@@ -7,17 +7,119 @@
 # <<
 
 import time
+from bisect import bisect_left
 from collections import Counter
 from dataclasses import dataclass, field
-from typing import Dict, TypeVar
+from typing import (
+    Any,
+    Dict,
+    List,
+    Tuple,
+    TypeVar,
+    Optional,
+)
+
+from aiocacher.plugins._base import Operation
+
+try:
+    from opentelemetry import metrics as otel_metrics
+
+except ImportError:
+    otel_metrics = None
 
 T = TypeVar('T')
 
 __all__ = [
     'CacheStats',
+    'Histogram',
+    'OperationStats',
     'StatsPlugin',
 ]
 
+# upper bounds in seconds, roughly 1-2.5-5 steps from 50us to 10s
+LATENCY_BUCKETS = (
+    0.00005,
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+PHASES = ('total', 'backend', 'serialize')
+
+
+class Histogram:
+    """Fixed-bucket histogram; recording is one bisect and two additions, so it
+    is cheap enough to stay enabled.
+
+    >>> h = Histogram((0.001, 0.01))
+    >>> for v in (0.0005, 0.002, 0.003, 0.5):
+    ...     h.record(v)
+    >>> h.count, h.buckets, h.quantile(0.5)
+    (4, [1, 2, 1], 0.01)
+    """
+
+    __slots__ = ('bounds', 'buckets', 'count', 'sum')
+
+    def __init__(self, bounds: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.bounds = bounds
+        # the last bucket counts everything above the largest bound
+        self.buckets: List[int] = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def record(self, value: float) -> None:
+        self.buckets[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the ``q`` quantile."""
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank:
+                return self.bounds[i] if i < len(self.bounds) else float('inf')
+        return float('inf')  # pragma: no cover
+
+
+def _phase_histograms() -> Dict[str, Histogram]:
+    return {phase: Histogram() for phase in PHASES}
+
+
+@dataclass
+class OperationStats:
+    calls: int = 0
+    errors: int = 0
+    timeouts: int = 0
+    bytes_in: int = 0
+    bytes_out: int = 0
+    latency: Dict[str, Histogram] = field(default_factory=_phase_histograms)
+
+    def record(self, op: Operation) -> None:
+        self.calls += 1
+        self.errors += op.error is not None
+        self.timeouts += op.timed_out
+        self.bytes_in += op.bytes_in
+        self.bytes_out += op.bytes_out
+        self.latency['total'].record(op.total)
+        self.latency['backend'].record(op.backend)
+        self.latency['serialize'].record(op.serialize)
+
 
 @dataclass(frozen=False, unsafe_hash=True)
 class CacheStats:
@@ -25,10 +127,12 @@ class CacheStats:
     cache_hits: int = 0
     cache_misses: int = 0
     cache_types: Counter = field(default_factory=Counter)
+    operations: Dict[str, OperationStats] = field(default_factory=dict, hash=False)
 
     @property
     def hit_ratio(self) -> float:
-        return float(self.cache_hits) / float(self.cache_hits + self.cache_misses)
+        calls = self.cache_hits + self.cache_misses
+        return float(self.cache_hits) / float(calls) if calls else 0.0
 
     @property
     def top_types(self) -> Dict[str, int]:
@@ -37,27 +141,117 @@ class CacheStats:
 
 
 class StatsPlugin:
+    """Counts hits, misses and result types of ``cached()`` functions, and keeps
+    per-operation call counts, bytes, errors, timeouts and latency histograms of
+    every ``Cache`` operation.
+
+    ``prometheus()`` renders them in the Prometheus text format. Passing an
+    OpenTelemetry ``meter``, or ``meter=True`` for the global one, also records
+    each operation on OpenTelemetry instruments.
+    """
 
-    __slots__ = ('stats',)
+    __slots__ = ('stats', '_otel')
 
-    def __init__(self):
+    def __init__(self, meter: Optional[Any] = None):
         self.stats = CacheStats()
+        self._otel = None
 
-    async def before_first_call(self):
+        if meter is True:
+            if otel_metrics is None:
+                raise RuntimeError('meter=True requires the opentelemetry-api package')
+            meter = otel_metrics.get_meter('aiocacher')
+
+        if meter is not None:
+            # yapf: disable
+            self._otel = (
+                meter.create_histogram(
+                    'aiocacher.operation.duration', unit='s',
+                    description='Time spent in cache operations, by phase',
+                ),
+                meter.create_counter(
+                    'aiocacher.operation.io', unit='By',
+                    description='Bytes read from and written to the backend',
+                ),
+                meter.create_counter(
+                    'aiocacher.operation.failures',
+                    description='Cache operations that raised or timed out',
+                ),
+            )
+            # yapf: enable
+
+    def before_first_call(self):
         self.stats.first_call = time.monotonic()
 
-    async def on_cache_hit(self, key: str):
+    def on_cache_hit(self, key: str):
         self.stats.cache_hits += 1
 
-    async def on_cache_miss(self, key: str):
+    def on_cache_miss(self, key: str):
         self.stats.cache_misses += 1
 
-    async def before_call(self):
-        ...
-
-    async def after_call(self, result: T) -> T:
+    def after_call(self, result: T) -> T:
         self.stats.cache_types[type(result)] += 1
         return result
 
-    async def on_teardown(self):
-        ...
+    def on_operation(self, op: Operation):
+        stats = self.stats.operations.get(op.name)
+        if stats is None:
+            stats = self.stats.operations[op.name] = OperationStats()
+        stats.record(op)
+
+        if self._otel is not None:
+            self._record_otel(op)
+
+    def _record_otel(self, op: Operation) -> None:
+        duration, io, failures = self._otel
+        for phase in PHASES:
+            duration.record(getattr(op, phase), {'op': op.name, 'phase': phase})
+        if op.bytes_in:
+            io.add(op.bytes_in, {'op': op.name, 'direction': 'in'})
+        if op.bytes_out:
+            io.add(op.bytes_out, {'op': op.name, 'direction': 'out'})
+        if op.timed_out or op.error:
+            reason = 'timeout' if op.timed_out else op.error
+            failures.add(1, {'op': op.name, 'reason': reason})
+
+    def prometheus(self, prefix: str = 'aiocacher') -> str:
+        """Renders the statistics in the Prometheus text exposition format."""
+        s = self.stats
+        lines = [
+            f'# TYPE {prefix}_cache_hits_total counter',
+            f'{prefix}_cache_hits_total {s.cache_hits}',
+            f'# TYPE {prefix}_cache_misses_total counter',
+            f'{prefix}_cache_misses_total {s.cache_misses}',
+            f'# TYPE {prefix}_cache_hit_ratio gauge',
+            f'{prefix}_cache_hit_ratio {s.hit_ratio}',
+        ]
+
+        ops = sorted(s.operations.items())
+        for name, attr in (
+            ('operations_total', 'calls'),
+            ('operation_errors_total', 'errors'),
+            ('operation_timeouts_total', 'timeouts'),
+        ):
+            lines.append(f'# TYPE {prefix}_{name} counter')
+            for op, st in ops:
+                lines.append(f'{prefix}_{name}{{op="{op}"}} {getattr(st, attr)}')
+
+        metric = f'{prefix}_operation_bytes_total'
+        lines.append(f'# TYPE {metric} counter')
+        for op, st in ops:
+            lines.append(f'{metric}{{op="{op}",direction="in"}} {st.bytes_in}')
+            lines.append(f'{metric}{{op="{op}",direction="out"}} {st.bytes_out}')
+
+        metric = f'{prefix}_operation_duration_seconds'
+        lines.append(f'# TYPE {metric} histogram')
+        for op, st in ops:
+            for phase, h in st.latency.items():
+                labels = f'op="{op}",phase="{phase}"'
+                cumulative = 0
+                for bound, n in zip(h.bounds + (float('inf'),), h.buckets):
+                    cumulative += n
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'{metric}_bucket{{{labels},le="{le}"}} {cumulative}')
+                lines.append(f'{metric}_sum{{{labels}}} {h.sum}')
+                lines.append(f'{metric}_count{{{labels}}} {h.count}')
+
+        return '\n'.join(lines) + '\n'
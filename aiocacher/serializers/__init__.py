@@ -8,10 +8,17 @@
 
 from aiocacher.serializers._base import BaseSerializer as SerializerT
 from aiocacher.serializers.serializers import *
+from aiocacher.serializers.compression import CompressedSerializer, train_dictionary
 
 
 __all__ = [
     'SerializerT',
     'BaseSerializer',
+    'CompressedSerializer',
     'DillSerializer',
+    'JsonSerializer',
+    'MsgpackSerializer',
+    'OrjsonSerializer',
+    'PickleSerializer',
+    'train_dictionary',
 ]
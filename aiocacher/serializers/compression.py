@@ -0,0 +1,181 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   async-redis-cache, 2021
+#   LiveViewTech
+# <<
+
+import threading
+import zlib
+from typing import (
+    Any,
+    Dict,
+    List,
+    Optional,
+)
+
+try:
+    import zstandard
+
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame as lz4
+
+except ImportError:
+    lz4 = None
+
+__all__ = [
+    'CompressedSerializer',
+    'train_dictionary',
+]
+
+# Compressed payloads start with MAGIC followed by one codec byte. 0xC1 is never
+#  emitted by msgpack, isn't a valid first byte for pickle or UTF-8 JSON, so
+# payloads written before compression was enabled are passed through untouched.
+MAGIC = 0xC1
+RAW = 0x00
+ZLIB = 0x01
+LZ4 = 0x02
+ZSTD = 0x03
+ZSTD_DICT = 0x04
+
+CODECS = {
+    'zlib': ZLIB,
+    'lz4': LZ4,
+    'zstd': ZSTD,
+}
+
+
+class CompressedSerializer:
+    """Wraps another serializer and compresses its output once it is at least
+    ``threshold`` bytes long.
+
+    Passing a ``dictionary`` trained with ``train_dictionary`` on samples of one
+    namespace's values makes zstd effective on small, repetitive payloads; use
+    one ``Cache`` (and serializer) per namespace to keep dictionaries separate.
+
+    >>> from aiocacher.serializers import PickleSerializer
+    >>> s = CompressedSerializer(PickleSerializer(), threshold=64)
+    >>> data = s.dumps('abc' * 100)
+    >>> data[:2], len(data) < 300
+    (b'\\xc1\\x01', True)
+    >>> s.loads(data) == 'abc' * 100
+    True
+    >>> s.loads(PickleSerializer().dumps('legacy'))
+    'legacy'
+    """
+
+    def __init__(
+        self,
+        serializer: Any,
+        threshold: int = 1024,
+        codec: str = 'zlib',
+        level: Optional[int] = None,
+        dictionary: Optional[bytes] = None,
+    ):
+        if codec not in CODECS:
+            raise RuntimeError(f'unknown compression codec {codec!r}')
+        if codec == 'zstd' and zstandard is None:
+            raise RuntimeError('zstd compression requires the zstandard package')
+        if codec == 'lz4' and lz4 is None:
+            raise RuntimeError('lz4 compression requires the lz4 package')
+        if dictionary is not None and codec != 'zstd':
+            raise RuntimeError('compression dictionaries are only supported by zstd')
+
+        self.serializer = serializer
+        self._threshold = threshold
+        self._codec = CODECS[codec]
+        self._level = level
+        self._zdict = zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+        # zstd (de)compressors aren't thread-safe and payloads may be serialized
+        #  in an executor, so every thread gets its own
+        self._zstd = threading.local()
+
+        if self._zdict is not None:
+            self._codec = ZSTD_DICT
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # neither the per-thread codecs nor a compiled dictionary pickle, e.g. to
+        #  a ProcessPoolExecutor, so they are rebuilt on the other side
+        state = self.__dict__.copy()
+        del state['_zstd']
+        state['_zdict'] = self._zdict.as_bytes() if self._zdict is not None else None
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        zdict = state.pop('_zdict')
+        self.__dict__.update(state)
+        self._zdict = zstandard.ZstdCompressionDict(zdict) if zdict is not None else None
+        self._zstd = threading.local()
+
+    def dumps(self, value: Any) -> bytes:
+        data = self.serializer.dumps(value)
+
+        if len(data) < self._threshold:
+            return bytes((MAGIC, RAW)) + data
+
+        if self._codec == ZLIB:
+            packed = zlib.compress(data, -1 if self._level is None else self._level)
+        elif self._codec == LZ4:
+            packed = lz4.compress(data, compression_level=self._level or 0)
+        else:
+            packed = self._zstd_codec('compressor').compress(data)
+
+        # not worth it, e.g. already compressed media
+        if len(packed) >= len(data):
+            return bytes((MAGIC, RAW)) + data
+
+        return bytes((MAGIC, self._codec)) + packed
+
+    def loads(self, value: bytes) -> Any:
+        if value is None or len(value) < 2 or value[0] != MAGIC:
+            return self.serializer.loads(value)
+
+        codec, data = value[1], memoryview(value)[2:]
+
+        if codec == RAW:
+            data = bytes(data)
+        elif codec == ZLIB:
+            data = zlib.decompress(data)
+        elif codec == LZ4:
+            if lz4 is None:
+                raise RuntimeError('value was compressed with lz4, which is not installed')
+            data = lz4.decompress(data)
+        elif codec in (ZSTD, ZSTD_DICT):
+            if zstandard is None:
+                raise RuntimeError('value was compressed with zstd, which is not installed')
+            if codec == ZSTD_DICT and self._zdict is None:
+                raise RuntimeError('value was compressed with a zstd dictionary')
+            data = self._decompressor().decompress(data)
+        else:
+            raise RuntimeError(f'unknown compression codec {codec:#x}')
+
+        return self.serializer.loads(data)
+
+    def _decompressor(self):
+        if self._codec in (ZSTD, ZSTD_DICT):
+            return self._zstd_codec('decompressor')
+        return zstandard.ZstdDecompressor()
+
+    def _zstd_codec(self, kind: str):
+        codec = getattr(self._zstd, kind, None)
+        if codec is None:
+            kw = {'dict_data': self._zdict} if self._zdict else {}
+            if kind == 'compressor':
+                if self._level is not None:
+                    kw['level'] = self._level
+                codec = zstandard.ZstdCompressor(**kw)
+            else:
+                codec = zstandard.ZstdDecompressor(**kw)
+            setattr(self._zstd, kind, codec)
+        return codec
+
+
+def train_dictionary(samples: List[bytes], size: int = 16 * 1024) -> bytes:
+    """Trains a zstd dictionary from serialized sample values of one namespace."""
+    if zstandard is None:
+        raise RuntimeError('training dictionaries requires the zstandard package')
+    return zstandard.train_dictionary(size, samples).as_bytes()
@@ -7,8 +7,9 @@
 # <<
 
 import pickle
+import struct
 from dataclasses import asdict, _is_dataclass_instance
-from typing import Any, Dict
+from typing import Any, Dict, List
 
 try:
     import ujson as json
@@ -16,13 +17,25 @@ try:
 except ImportError:
     import json
 
+try:
+    import msgpack
+
+except ImportError:
+    msgpack = None
+
 __all__ = [
     'BaseSerializer',
     'JsonSerializer',
+    'OrjsonSerializer',
+    'MsgpackSerializer',
     'PickleSerializer',
     'DillSerializer',
 ]
 
+# first byte of a protocol 5 pickle framed with out-of-band buffers; a pickle
+#  stream always starts with PROTO (0x80) so this can't be mistaken for one.
+OOB_MARKER = 0x81
+
 
 class BaseSerializer:
 
@@ -57,15 +70,114 @@ class JsonSerializer(BaseSerializer):
 
 
 class PickleSerializer(BaseSerializer):
+    """Pickles values; with protocol 5, buffers of at least ``oob_threshold`` bytes
+    from objects that reduce to a ``PickleBuffer`` (numpy arrays, pandas frames,
+    ...) are sent out-of-band and appended after the pickle stream, so loading
+    hands them back as zero-copy memoryviews of the stored payload.
+
+    >>> s = PickleSerializer(protocol=5, oob_threshold=4)
+    >>> bytes(s.loads(s.dumps(pickle.PickleBuffer(b'abcdef'))))
+    b'abcdef'
+    """
+
+    def __init__(
+        self,
+        encoding: str = BaseSerializer.DEFAULT_ENCODING,
+        protocol: int = pickle.DEFAULT_PROTOCOL,
+        oob_threshold: int = 64 * 1024,
+    ):
+        super().__init__(encoding=encoding)
+        self._protocol = protocol
+        self._oob_threshold = oob_threshold
 
     def dumps(self, value: Any) -> bytes:
-        ret = pickle.dumps(value)
-        return ret
+        if self._protocol < 5:
+            return pickle.dumps(value, protocol=self._protocol)
+
+        buffers: List[pickle.PickleBuffer] = []
+
+        def out_of_band(buf: pickle.PickleBuffer) -> bool:
+            if buf.raw().nbytes < self._oob_threshold:
+                return True  # serialize in-band
+            buffers.append(buf)
+            return False
+
+        ret = pickle.dumps(value, protocol=self._protocol, buffer_callback=out_of_band)
+        if not buffers:
+            return ret
+
+        raws = [buf.raw() for buf in buffers]
+        header = struct.pack(
+            f'<BI{len(raws) + 1}Q',
+            OOB_MARKER,
+            len(raws),
+            len(ret),
+            *(raw.nbytes for raw in raws),
+        )
+        return b''.join([header, ret, *raws])
+
+    def loads(self, value: bytes) -> Any:
+        if value is None:
+            return None
+        if value[0] != OOB_MARKER:
+            return pickle.loads(value)
+
+        view = memoryview(value)
+        count, = struct.unpack_from('<I', view, 1)
+        sizes = struct.unpack_from(f'<{count + 1}Q', view, 5)
+        offset = 5 + 8 * (count + 1)
+
+        chunks = []
+        for size in sizes:
+            chunks.append(view[offset:offset + size])
+            offset += size
+
+        data, *buffers = chunks
+        return pickle.loads(data, buffers=buffers)
+
+
+try:
+    import orjson
+
+    class OrjsonSerializer(BaseSerializer):
+        """JSON via orjson, which encodes straight to ``bytes``."""
+
+        def __init__(
+            self,
+            encoding: str = BaseSerializer.DEFAULT_ENCODING,
+            option: int = 0,
+        ):
+            super().__init__(encoding=encoding)
+            self._option = option
+
+        def dumps(self, value: Any) -> bytes:
+            return orjson.dumps(value, option=self._option)
+
+        def loads(self, value: bytes) -> Any:
+            if value is None:
+                return None
+            return orjson.loads(value)
+
+except ImportError:
+    # fallback
+    OrjsonSerializer = JsonSerializer
+
+
+class MsgpackSerializer(BaseSerializer):
+    """Compact binary encoding for JSON-like values, plus ``bytes``."""
+
+    def __init__(self, encoding: str = BaseSerializer.DEFAULT_ENCODING):
+        if msgpack is None:
+            raise RuntimeError('MsgpackSerializer requires the msgpack package')
+        super().__init__(encoding=encoding)
+
+    def dumps(self, value: Any) -> bytes:
+        return msgpack.packb(value, use_bin_type=True)
 
     def loads(self, value: bytes) -> Any:
         if value is None:
             return None
-        return pickle.loads(value)
+        return msgpack.unpackb(value, raw=False)
 
 
 try:
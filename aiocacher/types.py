@@ -13,6 +13,7 @@ from typing import (
     Dict,
     Tuple,
     Callable,
+    Optional,
     Protocol,
     Union,
 )
@@ -26,3 +27,10 @@ class Callback(Protocol):
 
 KeyBuildFn = Callable[[Callable, Tuple[Any, ...], Dict[str, Any]], str]
 TimeT = Union[int, float, timedelta]
+# a TTL for every key written by ``setmany``, or one per key
+ManyTTL = Union[Optional[int], Dict[str, Optional[int]]]
+# a value read from a backend and the seconds it has left to live, None when
+#  it doesn't expire
+ValueTTL = Tuple[Optional[Any], Optional[float]]
+# a TTL chosen from a computed ``(result, elapsed)``, for ``Cache.cached``
+TTLFn = Callable[[Any, float], Optional[TimeT]]
@@ -6,28 +6,65 @@
 #   LiveViewTech
 # <<
 
+import asyncio
 import threading
 from datetime import timedelta
-from hashlib import sha1
-from typing import Optional
+from hashlib import blake2b
+from operator import itemgetter
+from weakref import WeakKeyDictionary
+from typing import (
+    Any,
+    Dict,
+    Tuple,
+    Callable,
+    Iterable,
+    List,
+    Optional,
+)
 
 import math
 from toolz.functoolz import is_arity, has_keywords
 
-from aiocacher.types import TimeT
+from aiocacher.types import ManyTTL, TimeT
 
 __all__ = [
     'MAX_KEYLEN',
     'default_key_builder',
+    'key_plan',
+    'namespace_prefix',
     'trim_key',
     'convert_ttl',
+    'key_ttl',
+    'StripedLock',
 ]
 
 MAX_KEYLEN = 80
 
+# writes of more keys than this skip the per-key locks, see ``StripedLock``
+BULK_KEYS = 16
 
-def default_key_builder(func, args, kwargs) -> str:
-    """Converts keys passed to a single function into a SHA1 checksum for caching."""
+# hex characters of the digest that replaces the overflow of a long key
+KEY_DIGEST_LEN = 32
+
+
+def key_plan(func: Callable) -> Callable[[Tuple[Any, ...], Dict[str, Any]], str]:
+    """Inspects the signature of ``func`` once and returns a builder that turns the
+    arguments of a call into a stable digest.
+
+    The digest is taken over the ``repr`` of the function's module and name, the
+    arguments and the keyword arguments sorted by name, so arguments of
+    different types or split differently don't collide, and the digest doesn't
+    depend on the order keywords were passed in or on the process' hash seed.
+
+    >>> def fn(a, b=1): ...
+    >>> build = key_plan(fn)
+    >>> build((1,), {'b': 2, 'c': 3}) == build((1,), {'c': 3, 'b': 2})
+    True
+    >>> build((1,), {}) == build(('1',), {}), build(('ab', 'c'), {}) == build(('a', 'bc'), {})
+    (False, False)
+    >>> len(build((1,), {}))
+    40
+    """
     try:
         has_kwargs = has_keywords(func) is not False
         is_unary = is_arity(1, func)
@@ -35,24 +72,44 @@ def default_key_builder(func, args, kwargs) -> str:
         has_kwargs = True
         is_unary = False
 
-    f_name = func.__qualname__
+    f_name = f'{getattr(func, "__module__", None) or ""}.{func.__qualname__}'
+    by_name = itemgetter(0)
+
+    def build(args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> str:
+        if not args and not has_kwargs:
+            k = f_name, threading.get_ident()
+
+        elif is_unary and args:
+            k = f_name, args[0]
 
-    if not args and not has_kwargs:
-        k = f_name, threading.get_ident()
+        elif has_kwargs:
+            k = f_name, args or None, tuple(sorted(kwargs.items(), key=by_name))
 
-    elif is_unary and args:
-        k = f_name, str(args[0])
+        else:
+            k = f_name, args
 
-    elif has_kwargs:
-        k = f_name, args or None, frozenset(kwargs.items() if kwargs else [])
+        return blake2b(repr(k).encode('utf-8'), digest_size=20).hexdigest()
 
-    else:
-        k = f_name, args
+    return build
 
-    return trim_key(sha1(''.join(map(str, k)).encode('utf-8')).hexdigest())
 
+# plans of the functions ``default_key_builder`` has seen; weak, so decorated
+#  functions and their closures can still be collected
+_plans: 'WeakKeyDictionary[Callable, Callable]' = WeakKeyDictionary()
 
-def convert_ttl(val: TimeT) -> Optional[int]:
+
+def default_key_builder(func, args, kwargs) -> str:
+    """Converts keys passed to a single function into a BLAKE2 checksum for caching."""
+    try:
+        plan = _plans.get(func)
+    except TypeError:  # pragma: no cover, not weakly referenceable
+        return key_plan(func)(args, kwargs)
+    if plan is None:
+        plan = _plans[func] = key_plan(func)
+    return plan(args, kwargs)
+
+
+def convert_ttl(val: Optional[TimeT]) -> Optional[int]:
     """Allow different input values that represent Time to reduce to an integer.
 
     >>> convert_ttl(0)
@@ -63,7 +120,11 @@ def convert_ttl(val: TimeT) -> Optional[int]:
     2
     >>> convert_ttl(timedelta(minutes=1))
     60
+    >>> convert_ttl(None) is None
+    True
     """
+    if val is None:
+        return None
     if isinstance(val, timedelta):
         val = val.total_seconds()
     if isinstance(val, float):
@@ -72,12 +133,108 @@ def convert_ttl(val: TimeT) -> Optional[int]:
     return val
 
 
-def trim_key(key: str) -> str:
-    """Fixes a string to a fixed length defined as a constant ``MAX_KEYLEN``.
+def namespace_prefix(global_namespace: Optional[str], namespace: str) -> str:
+    """The prefix shared by every stored key of ``namespace``.
+
+    >>> namespace_prefix('app', 'users')
+    'app:users:'
+    >>> namespace_prefix(None, 'users')
+    'users:'
+    """
+    if global_namespace:
+        return f'{global_namespace}:{namespace}:'
+    return f'{namespace}:'
+
+
+def key_ttl(ttl: ManyTTL, key: str) -> Optional[int]:
+    """The TTL of ``key`` from a ``setmany`` TTL argument, one for all keys or a
+    dict with one per key.
+
+    >>> key_ttl(10, 'a'), key_ttl({'a': 5}, 'a'), key_ttl({'a': 5}, 'b')
+    (10, 5, None)
+    """
+    if isinstance(ttl, dict):
+        return ttl.get(key)
+    return ttl
+
+
+def trim_key(key: str, keep: int = 0) -> str:
+    """Fits a key into ``MAX_KEYLEN`` characters without letting distinct keys
+    collide.
+
+    Short keys are returned as they are. Longer keys keep their first ``keep``
+    characters, typically the namespace prefix, plus as much of the rest as
+    fits, followed by a digest of the whole key.
 
     >>> trim_key('')
     ''
     >>> trim_key('abc')
     'abc'
+    >>> a, b = trim_key('x' * 100 + 'a'), trim_key('x' * 100 + 'b')
+    >>> a != b, len(a) == MAX_KEYLEN, a[:10]
+    (True, True, 'xxxxxxxxxx')
+    >>> trim_key('ns:' + 'x' * 100, keep=3).startswith('ns:')
+    True
     """
-    return str(key)[:MAX_KEYLEN]
\ No newline at end of file
+    key = str(key)
+    if len(key) <= MAX_KEYLEN:
+        return key
+    digest = blake2b(key.encode('utf-8'), digest_size=KEY_DIGEST_LEN // 2).hexdigest()
+    # the namespace is always kept, even past MAX_KEYLEN, so namespaced clears find the key
+    head = key[:max(keep, MAX_KEYLEN - KEY_DIGEST_LEN - 1)]
+    return f'{head}#{digest}'
+
+
+class StripedLock:
+    """A fixed set of asyncio locks shared between keys by hash, so operations on
+    the same key are serialized while unrelated keys rarely contend.
+
+    Writes of more than ``bulk_keys`` keys take no lock at all: they would hold
+    most stripes and stall every unrelated write, and the backend writes each
+    key atomically anyway, so they are last-write-wins against other writers.
+
+    Locks are created on first use so they bind to the running event loop.
+    """
+
+    __slots__ = ('_stripes', '_bulk_keys', '_locks')
+
+    def __init__(self, stripes: int = 256, bulk_keys: int = BULK_KEYS):
+        self._stripes = max(1, stripes)
+        self._bulk_keys = bulk_keys
+        self._locks: Optional[List[asyncio.Lock]] = None
+
+    def __call__(self, keys: Iterable[str]) -> '_StripedLockContext':
+        if self._locks is None:
+            self._locks = [asyncio.Lock() for _ in range(self._stripes)]
+        if isinstance(keys, str):
+            keys = (keys,)
+        elif len(keys) > self._bulk_keys:
+            return _StripedLockContext([])
+        # acquire in a stable order so overlapping multi-key writers can't deadlock
+        stripes = sorted({hash(k) % self._stripes for k in keys})
+        return _StripedLockContext([self._locks[i] for i in stripes])
+
+
+class _StripedLockContext:
+
+    __slots__ = ('_locks', '_held')
+
+    def __init__(self, locks: List[asyncio.Lock]):
+        self._locks = locks
+        self._held: List[asyncio.Lock] = []
+
+    async def __aenter__(self) -> None:
+        try:
+            for lock in self._locks:
+                await lock.acquire()
+                self._held.append(lock)
+        except BaseException:
+            self._release()
+            raise
+
+    async def __aexit__(self, *exc) -> None:
+        self._release()
+
+    def _release(self) -> None:
+        while self._held:
+            self._held.pop().release()
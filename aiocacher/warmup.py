@@ -0,0 +1,236 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   async-redis-cache, 2021
+#   LiveViewTech
+# <<
+
+"""warmup.py
+
+Brings the hit ratio back up after a restart or ``purge`` instead of letting
+every first request pay for a miss.
+
+``WarmupPlugin`` records the hottest cache keys and, for each of them, the
+last call of the cached function that computed it. Its ``recording()`` is a
+``Recording`` that saves to and loads from a compact file. On startup a
+``Warmup``:
+
+- ``replay``s the recorded calls through their cached functions, which only
+  recomputes the values missing from the backend;
+- ``preload``s the values still in the backend into the local tier with
+  batched multi-gets.
+
+Both run with bounded concurrency, an optional rate limit in operations per
+second and a progress callback, so warming up does not overload upstreams.
+
+Calls are replayed on the functions passed to ``replay`` by their qualified
+name, with the recorded arguments; calls whose arguments the serializer
+cannot encode, such as methods and their ``self``, are left out of the file.
+"""
+
+import asyncio
+from logging import getLogger
+from time import monotonic
+from typing import (
+    Any,
+    Dict,
+    List,
+    Tuple,
+    Callable,
+    Iterable,
+    Optional,
+    NamedTuple,
+)
+
+from aiocacher.cache import MISSING, Cache
+from aiocacher.plugins.analytics import SpaceSaving
+from aiocacher.serializers import SerializerT, DillSerializer
+
+__all__ = [
+    'Recording',
+    'Warmup',
+    'WarmupPlugin',
+]
+
+# bumped whenever the layout of a saved ``Recording`` changes
+VERSION = 1
+
+Call = Tuple[str, tuple, Dict[str, Any]]
+ProgressFn = Callable[[int, int], None]
+
+logger = getLogger(__name__)
+
+
+def _qualname(fn: Callable) -> str:
+    return f'{getattr(fn, "__module__", None) or ""}.{fn.__qualname__}'
+
+
+class Recording(NamedTuple):
+    """The hottest keys, hottest first, and the calls that computed them as
+    ``(function name, args, kwargs)``."""
+    keys: List[str]
+    calls: List[Call]
+
+    def save(self, path: str, serializer: Optional[SerializerT] = None) -> int:
+        """Writes the recording to ``path``, returns how many calls it kept."""
+        serializer = serializer or DillSerializer()
+        calls = []
+        for call in self.calls:
+            try:
+                serializer.dumps(call)
+            except Exception:  # noqa
+                logger.debug('not recording unserializable call to %s', call[0])
+                continue
+            calls.append(call)
+
+        with open(path, 'wb') as fp:
+            fp.write(serializer.dumps((VERSION, self.keys, calls)))
+        return len(calls)
+
+    @classmethod
+    def load(cls, path: str, serializer: Optional[SerializerT] = None) -> 'Recording':
+        serializer = serializer or DillSerializer()
+        with open(path, 'rb') as fp:
+            version, keys, calls = serializer.loads(fp.read())
+        if version != VERSION:
+            raise RuntimeError(f'unsupported warm-up recording version {version}')
+        return cls(keys, calls)
+
+
+class WarmupPlugin:
+    """Records the ``top_keys`` hottest keys and the calls behind them.
+
+    Keys are ranked with the Space-Saving algorithm, so memory stays bounded
+    however many distinct keys are seen.
+    """
+
+    __slots__ = ('_keys', '_calls')
+
+    def __init__(self, top_keys: int = 1000):
+        self._keys = SpaceSaving(top_keys)
+        self._calls: Dict[str, Call] = {}
+
+    def on_cache_hit(self, key: str):
+        self._keys.offer(key)
+
+    def on_cache_miss(self, key: str):
+        self._keys.offer(key)
+
+    def after_compute(self, key: str, fn: Callable, args, kwargs, elapsed: float):
+        if key not in self._keys:
+            return
+        self._calls[key] = (_qualname(fn), tuple(args), dict(kwargs))
+        # drop the calls of keys the ranking has evicted since
+        if len(self._calls) > 2 * self._keys.capacity:
+            self._calls = {k: c for k, c in self._calls.items() if k in self._keys}
+
+    def recording(self, top: Optional[int] = None) -> Recording:
+        keys = [key for key, _, _ in self._keys.top(top)]
+        return Recording(keys, [self._calls[k] for k in keys if k in self._calls])
+
+
+class _RateLimit:
+    """Spaces out starts to at most ``rate`` per second."""
+
+    __slots__ = ('_interval', '_next', '_lock')
+
+    def __init__(self, rate: Optional[float]):
+        self._interval = 1.0 / rate if rate else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self) -> None:
+        if not self._interval:
+            return
+        async with self._lock:
+            now = monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self._interval
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+
+class Warmup:
+    """Replays or preloads a ``Recording`` into ``cache``.
+
+    At most ``concurrency`` calls or multi-gets are in flight, and no more
+    than ``rate`` of them start per second when it is set. ``progress`` is
+    called with ``(done, total)`` after each call or batch.
+    """
+
+    def __init__(
+        self,
+        cache: Cache,
+        concurrency: int = 8,
+        rate: Optional[float] = None,
+        progress: Optional[ProgressFn] = None,
+    ):
+        if concurrency < 1:
+            raise RuntimeError('concurrency must be at least 1')
+        self.cache = cache
+        self._concurrency = concurrency
+        self._rate = rate
+        self._progress = progress
+
+    async def _run(self, jobs: List[Callable[[], Any]], total: int) -> List[Any]:
+        semaphore = asyncio.Semaphore(self._concurrency)
+        limit = _RateLimit(self._rate)
+        done = 0
+
+        async def run(job):
+            nonlocal done
+            async with semaphore:
+                await limit.wait()
+                try:
+                    return await job()
+                finally:
+                    done += 1
+                    if self._progress is not None:
+                        self._progress(done, total)
+
+        return await asyncio.gather(*[run(job) for job in jobs], return_exceptions=True)
+
+    async def replay(self, recording: Recording, functions: Iterable[Callable]) -> int:
+        """Calls the cached ``functions`` with each recorded call of theirs, and
+        returns how many succeeded. Failures are logged, not raised."""
+        by_name = {_qualname(fn): fn for fn in functions}
+        # yapf: disable
+        calls = [
+            (by_name[name], args, kwargs)
+            for name, args, kwargs in recording.calls if name in by_name
+        ]
+        # yapf: enable
+
+        def job(fn, args, kwargs):
+            return lambda: fn(*args, **kwargs)
+
+        results = await self._run([job(*call) for call in calls], len(calls))
+
+        failed = 0
+        for (fn, _, _), result in zip(calls, results):
+            if isinstance(result, BaseException):
+                failed += 1
+                self.cache.logger.warning('warming up %s failed: %r', fn.__qualname__, result)
+        return len(calls) - failed
+
+    async def preload(self, recording: Recording, batch_size: int = 500) -> int:
+        """Loads the recorded keys still in the backend into the local tier, and
+        returns how many were found."""
+        if self.cache.local is None:
+            raise RuntimeError('preloading needs a cache with a local tier')
+
+        keys = recording.keys
+        batches = [keys[i:i + batch_size] for i in range(0, len(keys), batch_size)]
+
+        def job(batch):
+            return lambda: self.cache.getmany(batch, default=MISSING)
+
+        found = 0
+        for batch in await self._run([job(b) for b in batches], len(batches)):
+            if isinstance(batch, BaseException):
+                self.cache.logger.warning('preloading failed: %r', batch)
+                continue
+            found += sum(1 for v in batch.values() if v is not MISSING)
+        return found
+
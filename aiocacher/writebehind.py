@@ -0,0 +1,144 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   async-redis-cache, 2021
+#   LiveViewTech
+# <<
+
+"""writebehind.py
+
+The write-behind queue ``Cache`` uses for ``cached(wait_for_write=False)``.
+
+Instead of one task and one round-trip per miss, pending writes are held for
+``delay`` seconds and written together with a single ``setmany``:
+
+- a newer write to a key replaces the pending one, so only the latest value
+  is sent;
+- removing keys drops their queued writes and waits for a batch already
+  writing them, so a removed key is not written back afterwards;
+- one batch is in flight at a time, so writes to a key land in order, and
+  whatever piles up meanwhile goes out as the next batch;
+- once ``max_pending`` keys wait, writers await the batch in flight before
+  queueing more, which bounds memory when the backend falls behind;
+- ``Cache.close()`` flushes the queue, so no write is lost on shutdown.
+"""
+
+import asyncio
+from typing import (
+    Any,
+    Dict,
+    Tuple,
+    Optional,
+)
+
+__all__ = [
+    'WriteBehind',
+]
+
+# how long writes are held to be coalesced, in seconds
+WRITE_DELAY = 0.005
+
+# how many keys may wait to be written before writers are held back
+MAX_PENDING = 10_000
+
+
+class WriteBehind:
+    """Coalesces ``put``s into batched ``cache.setmany`` calls."""
+
+    __slots__ = (
+        'cache',
+        'superseded',
+        '_delay',
+        '_max_pending',
+        '_pending',
+        '_batch',
+        '_handle',
+        '_writing',
+    )
+
+    def __init__(
+        self,
+        cache: Any,
+        delay: float = WRITE_DELAY,
+        max_pending: int = MAX_PENDING,
+    ):
+        self.cache = cache
+        self.superseded = 0
+        self._delay = delay
+        self._max_pending = max(1, max_pending)
+        self._pending: Dict[str, Tuple[Any, Optional[int]]] = {}
+        self._batch: Dict[str, Tuple[Any, Optional[int]]] = {}
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self._writing: Optional[asyncio.Future] = None
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    async def put(self, key: str, value: Any, ttl: Optional[int]) -> None:
+        """Queues ``value`` to be written to ``key``; only waits when the queue
+        is full."""
+        while key not in self._pending and len(self._pending) >= self._max_pending:
+            await self._drain()
+
+        if key in self._pending:
+            self.superseded += 1
+        self._pending[key] = (value, ttl)
+
+        if self._handle is None and self._writing is None:
+            self._handle = asyncio.get_running_loop().call_later(self._delay, self._start)
+
+    async def flush(self) -> None:
+        """Writes everything queued now and waits until it is written."""
+        while self._pending or self._writing is not None:
+            await self._drain()
+
+    async def discard(self, key: str) -> None:
+        """Drops the queued write to ``key``, and waits for the batch in flight
+        when it is writing ``key``."""
+        self._pending.pop(key, None)
+        if self._writing is not None and key in self._batch:
+            await asyncio.shield(self._writing)
+
+    async def discard_prefix(self, prefix: str) -> None:
+        for key in [k for k in self._pending if k.startswith(prefix)]:
+            del self._pending[key]
+        if self._writing is not None and any(k.startswith(prefix) for k in self._batch):
+            await asyncio.shield(self._writing)
+
+    async def clear(self) -> None:
+        self._pending.clear()
+        if self._writing is not None:
+            await asyncio.shield(self._writing)
+
+    async def _drain(self) -> None:
+        if self._writing is None:
+            self._start()
+        if self._writing is not None:
+            # the batch is written even if the waiting caller is cancelled
+            await asyncio.shield(self._writing)
+
+    def _start(self) -> None:
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        if self._writing is not None or not self._pending:
+            return
+        self._batch, self._pending = self._pending, {}
+        self._writing = asyncio.ensure_future(self._write(self._batch))
+
+    async def _write(self, batch: Dict[str, Tuple[Any, Optional[int]]]) -> None:
+        # yapf: disable
+        values = {k: v for k, (v, _) in batch.items()}
+        ttls = {k: ttl for k, (_, ttl) in batch.items()}
+        # yapf: enable
+        try:
+            await self.cache.setmany(values, ttl=ttls)
+        except Exception as e:  # noqa
+            self.cache.logger.error('writing %d queued keys failed: %r', len(batch), e)
+        finally:
+            self._writing = None
+            self._batch = {}
+            # what was queued during this write goes out right away
+            if self._pending:
+                self._start()
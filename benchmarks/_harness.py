@@ -0,0 +1,146 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   async-redis-cache, 2021
+#   LiveViewTech
+# <<
+
+"""_harness.py
+
+Shared helpers for the benchmark scripts.
+"""
+
+import asyncio
+import inspect
+from time import perf_counter
+from typing import (
+    Any,
+    Dict,
+    List,
+    Callable,
+    Optional,
+    Awaitable,
+)
+
+from aiocacher.backends import MemoryBackend
+
+__all__ = [
+    'SlowBackend',
+    'measure',
+    'run_concurrent',
+]
+
+
+class SlowBackend(MemoryBackend):
+    """A ``MemoryBackend`` that sleeps ``latency`` seconds per command to emulate
+    a network round-trip; with no latency it is a plain in-process backend."""
+
+    def __init__(self, latency: float = 0.0005, **kwargs):
+        super().__init__(**kwargs)
+        self.latency = latency
+
+    async def _rtt(self) -> None:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def get(self, key, **kwargs):
+        await self._rtt()
+        return await super().get(key)
+
+    async def getmany(self, keys, **kwargs):
+        await self._rtt()
+        return await super().getmany(keys)
+
+    async def getmany_ttl(self, keys, **kwargs):
+        await self._rtt()
+        return await super().getmany_ttl(keys)
+
+    async def set(self, key, value, ttl=None, **kwargs):
+        await self._rtt()
+        return await super().set(key, value, ttl=ttl)
+
+    async def replace(self, key, value, ttl=None, **kwargs):
+        await self._rtt()
+        return await super().replace(key, value, ttl=ttl)
+
+    async def setmany(self, keys_vals, ttl=None, **kwargs):
+        await self._rtt()
+        return await super().setmany(keys_vals, ttl=ttl)
+
+    async def expire(self, key, ttl, **kwargs):
+        await self._rtt()
+        return await super().expire(key, ttl)
+
+    async def delete(self, key, **kwargs):
+        await self._rtt()
+        return await super().delete(key)
+
+    async def purge(self, **kwargs):
+        await self._rtt()
+        await super().purge()
+
+    async def clear_namespace(self, global_namespace, namespace, **kwargs):
+        await self._rtt()
+        return await super().clear_namespace(global_namespace, namespace)
+
+
+async def run_concurrent(
+    fn: Callable[[int], Awaitable[Any]],
+    total: int,
+    concurrency: int,
+    setup: Optional[Callable[[], Awaitable[Any]]] = None,
+) -> float:
+    """Calls ``fn(i)`` for ``i in range(total)`` from ``concurrency`` workers
+    and returns the throughput in operations per second."""
+    if setup is not None:
+        await setup()
+
+    counter = iter(range(total))
+
+    async def worker():
+        for i in counter:
+            await fn(i)
+
+    start = perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return total / (perf_counter() - start)
+
+
+def _percentile(ordered: List[float], pct: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def measure(
+    fn: Callable[[int], Any],
+    iterations: int,
+    ops_per_call: int = 1,
+    before: Optional[Callable[[int], Awaitable[Any]]] = None,
+) -> Dict[str, float]:
+    """Times ``iterations`` sequential calls of ``fn(i)``, awaiting the result when
+    it is awaitable, and summarises them as throughput and latency percentiles.
+
+    ``ops_per_call`` scales throughput for calls that do several operations and
+    ``before(i)``, when given, runs untimed ahead of each call."""
+    timings: List[float] = []
+
+    for i in range(iterations):
+        if before is not None:
+            await before(i)
+        start = perf_counter()
+        ret = fn(i)
+        if inspect.isawaitable(ret):
+            await ret
+        timings.append(perf_counter() - start)
+
+    total = sum(timings)
+    timings.sort()
+    # yapf: disable
+    return {
+        'iterations': iterations,
+        'ops_per_sec': round(iterations * ops_per_call / total, 1),
+        'mean_us': round(total / iterations * 1e6, 2),
+        'p50_us': round(_percentile(timings, 50) * 1e6, 2),
+        'p99_us': round(_percentile(timings, 99) * 1e6, 2),
+    }
+    # yapf: enable
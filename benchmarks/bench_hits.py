@@ -0,0 +1,56 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   async-redis-cache, 2021
+#   LiveViewTech
+# <<
+
+"""bench_hits.py
+
+Latency of a cache hit, in microseconds, through ``Cache.get`` and through a
+``cached()`` function with and without a plugin, on an in-process backend so
+only the library's own overhead is measured.
+
+    python -m benchmarks.bench_hits
+"""
+
+import asyncio
+from time import perf_counter
+
+from aiocacher.cache import Cache
+from aiocacher.backends import MemoryBackend
+from aiocacher.plugins.stats import StatsPlugin
+
+HITS = 20000
+
+
+async def timed(fn, *args) -> float:
+    await fn(*args)
+    start = perf_counter()
+    for _ in range(HITS):
+        await fn(*args)
+    return (perf_counter() - start) / HITS * 1e6
+
+
+async def main():
+    cache = Cache(MemoryBackend(), namespace='bench')
+    await cache.set('key', 1)
+
+    async def lookup(user_id: int):
+        return user_id
+
+    plain = cache.cached(namespace='hits', omit_self=False)(lookup)
+    with_plugin = Cache(MemoryBackend(), namespace='bench', plugins=[StatsPlugin()])
+    plugged = with_plugin.cached(namespace='hits', omit_self=False)(lookup)
+
+    for name, fn, args in (
+        ('Cache.get', cache.get, ('key',)),
+        ('cached()', plain, (1,)),
+        ('cached() + plugin', plugged, (1,)),
+    ):
+        print(f'{name:>18} {await timed(fn, *args):>8.2f} us/hit')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
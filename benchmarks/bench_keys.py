@@ -0,0 +1,85 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   async-redis-cache, 2021
+#   LiveViewTech
+# <<
+
+"""bench_keys.py
+
+Per-call cost of building cache keys, and of a whole cache hit, with the
+precompiled key plan versus the previous per-call signature inspection.
+
+    python -m benchmarks.bench_keys
+"""
+
+import asyncio
+import threading
+from hashlib import sha1
+from time import perf_counter
+from timeit import Timer
+
+from toolz.functoolz import is_arity, has_keywords
+
+from aiocacher.cache import Cache
+from aiocacher.utils import trim_key, key_plan
+from aiocacher.backends import MemoryBackend
+
+HITS = 20000
+
+
+def legacy_key_builder(func, args, kwargs) -> str:
+    try:
+        has_kwargs = has_keywords(func) is not False
+        is_unary = is_arity(1, func)
+    except TypeError:
+        has_kwargs = True
+        is_unary = False
+
+    f_name = func.__qualname__
+
+    if not args and not has_kwargs:
+        k = f_name, threading.get_ident()
+    elif is_unary and args:
+        k = f_name, str(args[0])
+    elif has_kwargs:
+        k = f_name, args or None, frozenset(kwargs.items() if kwargs else [])
+    else:
+        k = f_name, args
+
+    return trim_key(sha1(''.join(map(str, k)).encode('utf-8')).hexdigest())
+
+
+async def lookup(user_id: int, region: str = 'us', limit: int = 10):
+    return user_id
+
+
+def bench_builders():
+    plan = key_plan(lookup)
+    args, kwargs = (12345,), {'region': 'eu', 'limit': 50}
+
+    for name, fn in (
+        ('legacy', lambda: legacy_key_builder(lookup, args, kwargs)),
+        ('key plan', lambda: plan(args, kwargs)),
+    ):
+        number, took = Timer(fn).autorange()
+        print(f'{"key builder":>12} {name:>10} {took / number * 1e6:>8.2f} us/call')
+
+
+async def bench_hits():
+    for name, key_builder in (('legacy', legacy_key_builder), ('key plan', None)):
+        cache = Cache(MemoryBackend(), namespace='bench')
+        fn = cache.cached(namespace='hits', key_builder=key_builder, omit_self=False)(lookup)
+        await fn(1, region='eu')
+
+        start = perf_counter()
+        for _ in range(HITS):
+            await fn(1, region='eu')
+        took = perf_counter() - start
+        print(f'{"cache hit":>12} {name:>10} {took / HITS * 1e6:>8.2f} us/call')
+
+
+if __name__ == '__main__':
+    bench_builders()
+    asyncio.run(bench_hits())
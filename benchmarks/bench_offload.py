@@ -0,0 +1,76 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   async-redis-cache, 2021
+#   LiveViewTech
+# <<
+
+"""bench_offload.py
+
+Event-loop lag while large values are written and read, with serialization
+inline on the loop versus offloaded to a thread pool. A ticker coroutine asks
+to wake up every millisecond; how late it wakes is the lag every other
+coroutine in the process would see.
+
+    python -m benchmarks.bench_offload
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+from aiocacher.cache import Cache
+from aiocacher.serializers import DillSerializer
+from benchmarks._harness import SlowBackend
+
+TICK = 0.001
+ROUNDS = 5
+# about 2.5MB once serialized
+PAYLOAD = [{'id': i, 'name': f'user-{i}', 'tags': ['a', 'b', 'c'] * 5} for i in range(40000)]
+
+
+async def ticker(lags: list, stop: asyncio.Event):
+    while not stop.is_set():
+        start = perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(perf_counter() - start - TICK)
+
+
+async def run(cache: Cache) -> dict:
+    lags, stop = [], asyncio.Event()
+    tick = asyncio.ensure_future(ticker(lags, stop))
+    await asyncio.sleep(0)
+
+    start = perf_counter()
+    for i in range(ROUNDS):
+        await cache.set(f'big-{i}', PAYLOAD)
+        await cache.get(f'big-{i}')
+    took = perf_counter() - start
+
+    stop.set()
+    await tick
+    lags.sort()
+    return {
+        'rounds/sec': ROUNDS / took,
+        'p50 lag ms': lags[len(lags) // 2] * 1e3,
+        'p99 lag ms': lags[int(len(lags) * 0.99)] * 1e3,
+        'max lag ms': lags[-1] * 1e3,
+    }
+
+
+async def main():
+    size = len(DillSerializer().dumps(PAYLOAD))
+    print(f'payload: {size / 1e6:.1f}MB serialized')
+
+    with ThreadPoolExecutor(2) as executor:
+        for name, cache in (
+            ('inline', Cache(SlowBackend(), global_timeout=60)),
+            ('offloaded', Cache(SlowBackend(), global_timeout=60, executor=executor)),
+        ):
+            result = await run(cache)
+            print(f'{name:>10} ' + '  '.join(f'{k} {v:>8.2f}' for k, v in result.items()))
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
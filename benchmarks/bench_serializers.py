@@ -0,0 +1,79 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   async-redis-cache, 2021
+#   LiveViewTech
+# <<
+
+"""bench_serializers.py
+
+Round-trip cost and encoded size of each serializer across payload shapes and
+sizes. Serializers that can't encode a payload are reported as ``n/a``.
+
+    python -m benchmarks.bench_serializers
+"""
+
+import os
+import pickle
+from timeit import Timer
+
+from aiocacher.serializers import (
+    DillSerializer,
+    JsonSerializer,
+    MsgpackSerializer,
+    OrjsonSerializer,
+    PickleSerializer,
+)
+
+try:
+    import numpy
+
+except ImportError:
+    numpy = None
+
+# yapf: disable
+PAYLOADS = {
+    'small dict': {'id': 1, 'name': 'blake', 'tags': ['a', 'b'], 'score': 1.5},
+    'list of 1k dicts': [{'id': i, 'name': str(i), 'vals': [i] * 5} for i in range(1000)],
+    'list of 10k dicts': [{'id': i, 'name': str(i), 'vals': [i] * 5} for i in range(10000)],
+    'str 1MB': 'x' * 1024 * 1024,
+    'buffer 1MB': pickle.PickleBuffer(os.urandom(1024 * 1024)),
+}
+# yapf: enable
+
+if numpy is not None:
+    PAYLOADS['ndarray 8MB'] = numpy.random.random(1024 * 1024)
+
+
+def serializers():
+    yield 'pickle', PickleSerializer()
+    yield 'pickle-5 oob', PickleSerializer(protocol=5)
+    yield 'dill', DillSerializer()
+    yield 'json', JsonSerializer()
+    yield 'orjson', OrjsonSerializer()
+    try:
+        yield 'msgpack', MsgpackSerializer()
+    except RuntimeError:
+        pass
+
+
+def main():
+    print(f'{"payload":>18} {"serializer":>14} {"dumps us":>10} {"loads us":>10} {"bytes":>10}')
+    for payload_name, payload in PAYLOADS.items():
+        for name, serializer in serializers():
+            try:
+                data = serializer.dumps(payload)
+                serializer.loads(data)
+            except Exception:
+                print(f'{payload_name:>18} {name:>14} {"n/a":>10}')
+                continue
+            number, dumps = Timer(lambda: serializer.dumps(payload)).autorange()
+            dumps = dumps / number * 1e6
+            number, loads = Timer(lambda: serializer.loads(data)).autorange()
+            loads = loads / number * 1e6
+            print(f'{payload_name:>18} {name:>14} {dumps:>10.1f} {loads:>10.1f} {len(data):>10}')
+
+
+if __name__ == '__main__':
+    main()
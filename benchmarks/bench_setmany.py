@@ -0,0 +1,72 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   async-redis-cache, 2021
+#   LiveViewTech
+# <<
+
+"""bench_setmany.py
+
+Compares ``RedisBackend.setmany`` against the previous MSET followed by a
+transactional EXPIRE pipeline per chunk. Needs a Redis server:
+
+    REDIS_PORT=6379 python -m benchmarks.bench_setmany
+"""
+
+import os
+import asyncio
+from time import perf_counter
+
+from toolz.itertoolz import partition_all
+
+from aiocacher.backends import RedisBackend
+
+SIZES = (10_000, 100_000)
+TTL = 60
+
+
+async def legacy_setmany(backend: RedisBackend, keys_vals, ttl):
+    conn = await backend.get_pool()
+    for chunk in partition_all(100, keys_vals.items()):
+        await conn.mset(dict(chunk))
+        async with conn.pipeline(transaction=True) as pipe:
+            for k, _ in chunk:
+                pipe = pipe.expire(k, ttl)
+            await pipe.execute()
+
+
+async def timed(coro) -> float:
+    start = perf_counter()
+    await coro
+    return perf_counter() - start
+
+
+async def main():
+    port = int(os.getenv('REDIS_PORT', '6379'))
+    db = int(os.getenv('REDIS_DB', '15'))
+    variants = {
+        'legacy': RedisBackend(port=port, db=db),
+        'chunk=100': RedisBackend(port=port, db=db),
+        'chunk=1000': RedisBackend(port=port, db=db, chunk_size=1000),
+        'chunk=1000 x4': RedisBackend(port=port, db=db, chunk_size=1000, concurrency=4),
+    }
+
+    print(f'{"variant":>16} {"keys":>8} {"seconds":>9} {"keys/sec":>10}')
+    for size in SIZES:
+        keys_vals = {f'bench:{i}': os.urandom(64) for i in range(size)}
+        for name, backend in variants.items():
+            await backend.purge()
+            if name == 'legacy':
+                took = await timed(legacy_setmany(backend, keys_vals, TTL))
+            else:
+                took = await timed(backend.setmany(keys_vals, ttl=TTL))
+            print(f'{name:>16} {size:>8} {took:>9.3f} {size / took:>10.0f}')
+
+    for backend in variants.values():
+        await backend.purge()
+        await backend.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
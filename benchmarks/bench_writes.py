@@ -0,0 +1,46 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   async-redis-cache, 2021
+#   LiveViewTech
+# <<
+
+"""bench_writes.py
+
+Write throughput of ``Cache.set`` as concurrency grows, comparing per-key lock
+striping against a single process-wide lock (the previous behaviour).
+
+    python -m benchmarks.bench_writes
+"""
+
+import asyncio
+
+from aiocacher.cache import Cache
+from benchmarks._harness import SlowBackend, run_concurrent
+
+TOTAL = 2000
+CONCURRENCY = (1, 10, 50, 100)
+
+
+async def main():
+    backend = SlowBackend()
+    cache = Cache(backend, namespace='bench')
+    global_lock = asyncio.Lock()
+
+    async def striped(i: int):
+        await cache.set(f'key-{i}', i)
+
+    async def serialized(i: int):
+        async with global_lock:
+            await cache.set(f'key-{i}', i)
+
+    print(f'{"concurrency":>12} {"global lock":>14} {"striped":>14}')
+    for n in CONCURRENCY:
+        before = await run_concurrent(serialized, TOTAL, n)
+        after = await run_concurrent(striped, TOTAL, n)
+        print(f'{n:>12} {before:>10.0f}/sec {after:>10.0f}/sec')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,203 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   async-redis-cache, 2021
+#   LiveViewTech
+# <<
+
+"""suite.py
+
+Hot-path benchmarks on an in-process backend, reported as JSON so runs can be
+compared for regressions. ``--latency`` adds an emulated round-trip to every
+backend command; by default only the library's own overhead is measured.
+
+    python -m benchmarks.suite > before.json
+    python -m benchmarks.suite --baseline before.json --tolerance 10
+
+With ``--baseline`` the exit status is 1 when any case's throughput dropped by
+more than ``--tolerance`` percent.
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import sys
+from datetime import datetime, timezone
+from typing import (
+    Any,
+    Dict,
+    List,
+    Callable,
+    Optional,
+)
+
+from aiocacher.cache import Cache
+from aiocacher.utils import default_key_builder
+from aiocacher.serializers import (
+    DillSerializer,
+    JsonSerializer,
+    MsgpackSerializer,
+    OrjsonSerializer,
+    PickleSerializer,
+)
+from benchmarks._harness import SlowBackend, measure
+
+BATCH = 100
+KEYSPACES = (1000, 10000, 100000)
+PAYLOAD = {'id': 1, 'name': 'blake', 'tags': ['a', 'b'], 'score': 1.5}
+
+
+def serializers():
+    yield 'pickle', PickleSerializer()
+    yield 'dill', DillSerializer()
+    yield 'json', JsonSerializer()
+    yield 'orjson', OrjsonSerializer()
+    try:
+        yield 'msgpack', MsgpackSerializer()
+    except RuntimeError:
+        pass
+
+
+async def lookup(user_id: int, region: str = 'us'):
+    return {'id': user_id, 'region': region}
+
+
+async def cases(latency: float, iterations: int):
+    """Yields ``(name, coroutine)`` for every benchmark; awaiting the coroutine runs
+    it, so skipped cases cost nothing."""
+
+    def fresh() -> Cache:
+        return Cache(SlowBackend(latency), namespace='bench', serializer=PickleSerializer())
+
+    cache = fresh()
+    await cache.set('hit', PAYLOAD)
+    await cache.set('replaced', PAYLOAD)
+    yield 'cache.get hit', measure(lambda i: cache.get('hit'), iterations)
+    yield 'cache.get miss', measure(lambda i: cache.get(f'miss-{i}'), iterations)
+    yield 'cache.set', measure(lambda i: cache.set(f'set-{i}', PAYLOAD), iterations)
+    yield 'cache.replace', measure(lambda i: cache.replace('replaced', PAYLOAD), iterations)
+
+    def batch(i: int) -> Dict[str, Any]:
+        return {f'many-{i}-{j}': PAYLOAD for j in range(BATCH)}
+
+    yield f'cache.setmany x{BATCH}', measure(
+        lambda i: cache.setmany(batch(i)),
+        max(1, iterations // 10),
+        ops_per_call=BATCH,
+    )
+
+    cached = fresh().cached(namespace='fn', omit_self=False)(lookup)
+    await cached(1)
+    yield 'cached() hit', measure(lambda i: cached(1), iterations)
+    yield 'cached() miss', measure(lambda i: cached(i + 2), iterations)
+
+    yield 'default_key_builder', measure(
+        lambda i: default_key_builder(lookup, (i,), {'region': 'eu'}),
+        iterations,
+    )
+
+    for name, serializer in serializers():
+        data = serializer.dumps(PAYLOAD)
+        yield f'{name}.dumps', measure(lambda i: serializer.dumps(PAYLOAD), iterations)
+        yield f'{name}.loads', measure(lambda i: serializer.loads(data), iterations)
+
+    for size in KEYSPACES:
+        cache = fresh()
+        backend = cache._backend
+        # the namespace holds a tenth of the keyspace, the rest is left alone
+        outside = {cache.build_key(f'other:{j}'): b'1' for j in range(size - size // 10)}
+        inside = {cache.build_key(f'target:{j}'): b'1' for j in range(size // 10)}
+
+        async def populate(i: int, backend=backend, outside=outside, inside=inside):
+            if not i:
+                await backend.setmany(outside, ttl=None)
+            await backend.setmany(inside, ttl=None)
+
+        yield f'clear_namespace {size} keys', measure(
+            lambda i, cache=cache: cache.clear_namespace('target'),
+            max(1, iterations // 200),
+            before=populate,
+        )
+
+
+def compare(
+    results: List[Dict[str, Any]],
+    baseline: List[Dict[str, Any]],
+    tolerance: float,
+) -> List[str]:
+    """Names the cases whose throughput fell more than ``tolerance`` percent."""
+    before = {r['name']: r['ops_per_sec'] for r in baseline}
+    # yapf: disable
+    return [
+        f'{r["name"]}: {before[r["name"]]:.0f} -> {r["ops_per_sec"]:.0f} ops/sec'
+        for r in results
+        if r['name'] in before
+        and r['ops_per_sec'] < before[r['name']] * (1 - tolerance / 100)
+    ]
+    # yapf: enable
+
+
+async def main(
+    latency: float,
+    iterations: int,
+    only: Optional[str],
+    describe: Callable[[str], None],
+) -> Dict[str, Any]:
+    results = []
+    async for name, bench in cases(latency, iterations):
+        if only and only not in name:
+            bench.close()
+            continue
+        result = await bench
+        describe(f'{name:>28} {result["ops_per_sec"]:>12.0f} ops/s '
+                 f'p50 {result["p50_us"]:>9.2f}us p99 {result["p99_us"]:>9.2f}us')
+        results.append({'name': name, **result})
+
+    # yapf: disable
+    return {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'latency': latency,
+            'iterations': iterations,
+        },
+        'results': results,
+    }
+    # yapf: enable
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds per backend command')
+    parser.add_argument('--iterations', type=int, default=5000)
+    parser.add_argument('--only', help='run the cases whose name contains this')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    parser.add_argument('--baseline', help='JSON report of a previous run to compare with')
+    parser.add_argument('--tolerance', type=float, default=10.0, help='percent')
+    opts = parser.parse_args()
+
+    report = asyncio.run(
+        main(
+            opts.latency,
+            opts.iterations,
+            opts.only,
+            lambda line: print(line, file=sys.stderr),
+        )
+    )
+
+    if opts.output:
+        with open(opts.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if opts.baseline:
+        with open(opts.baseline) as f:
+            regressions = compare(report['results'], json.load(f)['results'], opts.tolerance)
+        for line in regressions:
+            print(f'regression: {line}', file=sys.stderr)
+        sys.exit(1 if regressions else 0)
@@ -14,6 +14,7 @@ import string
 import pytest
 
 from aiocacher.cache import Cache
+from aiocacher.backends.memory import MemoryBackend
 from aiocacher.backends.redis import RedisBackend
 
 
@@ -52,6 +53,26 @@ async def cache(redis_backend):
     await o.close()
 
 
+@pytest.fixture(scope='function')
+@pytest.mark.asyncio
+async def memory_backend(event_loop):
+    o = MemoryBackend(loop=event_loop)
+    yield o
+    await o.close()
+
+
+@pytest.fixture(scope='function')
+@pytest.mark.asyncio
+async def memory_cache(memory_backend):
+    o = Cache(
+        memory_backend,
+        namespace='unittests',
+        global_timeout=5.0,
+    )
+    yield o
+    await o.close()
+
+
 @pytest.fixture(scope='function')
 def random_string(length: int = 16):
     return ''.join(random.choice(CHARS) for _ in range(length))
@@ -6,15 +6,35 @@
 #   LiveViewTech
 # <<
 
+import gc
 import random
 import asyncio
+import weakref
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from dataclasses import dataclass
 from datetime import timedelta
 
 import pytest
 
-from aiocacher.cache import UNSET, Cache
+try:
+    import msgpack
+
+except ImportError:
+    msgpack = None
+
+from aiocacher.cache import ENVELOPE, TOMBSTONE, UNSET, Cache
+from aiocacher.local import LocalCache
+from aiocacher.utils import default_key_builder
+from aiocacher.backends.memory import MemoryBackend
+from aiocacher.serializers import (
+    CompressedSerializer,
+    DillSerializer,
+    JsonSerializer,
+    MsgpackSerializer,
+    OrjsonSerializer,
+    PickleSerializer,
+)
 
 
 MARK = str(random.randint(0xf000, 0xffff))
@@ -122,6 +142,35 @@ async def test_decorator(cache: Cache, random_string, ttl):
         assert len(plugin.stats.top_types) == 1
 
 
+async def test_default_key_builder(memory_cache: Cache):
+
+    @memory_cache.cached(omit_self=False)
+    async def echo(val):
+        return val
+
+    @memory_cache.cached(omit_self=False)
+    async def concat(a, b):
+        return a + b
+
+    # keys keep argument types and boundaries apart
+    assert await echo(1) == 1
+    assert await echo('1') == '1'
+    assert await concat('a', 'bc') == 'abc'
+    assert await concat(['ab'], ['c']) == ['ab', 'c']
+    assert await concat('ab', 'c') == 'abc'
+    assert len(memory_cache._backend) == 5
+
+    # plans don't keep the functions they were built for alive
+    async def func(val):
+        return val
+
+    default_key_builder(func, (1,), {})
+    ref = weakref.ref(func)
+    del func
+    gc.collect()
+    assert ref() is None
+
+
 async def test_clear_namespace(cache: Cache):
 
     @cache.cached(ttl=1, namespace='inside', omit_self=False)
@@ -139,3 +188,628 @@ async def test_clear_namespace(cache: Cache):
     assert await other('')
     assert await cache.clear_namespace('outside') == 1
 
+
+async def test_coalesce(cache: Cache, random_string):
+    calls = Counter()
+
+    @cache.cached(namespace=random_string, ttl=5, coalesce=True, omit_self=False)
+    async def func(val: int):
+        calls[val] += 1
+        await asyncio.sleep(0.1)
+        return val * 2
+
+    results = await asyncio.gather(*[func(i % 2) for i in range(20)])
+    assert results == [(i % 2) * 2 for i in range(20)]
+    assert calls == {0: 1, 1: 1}
+
+
+async def test_coalesce_lock(cache: Cache, random_string):
+    other = Cache(cache._backend, namespace='unittests')
+    calls = Counter()
+
+    async def func():
+        calls['func'] += 1
+        await asyncio.sleep(0.2)
+        return True
+
+    a = cache.cached(namespace=random_string, ttl=5, coalesce_lock=2)(func)
+    b = other.cached(namespace=random_string, ttl=5, coalesce_lock=2)(func)
+
+    assert await asyncio.gather(a(), b()) == [True, True]
+    assert calls['func'] == 1
+
+
+async def test_local_tier(redis_backend, random_string):
+    local = LocalCache(max_entries=10, max_ttl=5)
+    cache = Cache(redis_backend, namespace='unittests', local=local)
+
+    await cache.set(random_string, Stats(1))
+    assert await cache.get(random_string) is await cache.get(random_string)
+    assert local.hits == 2
+
+    # writes from elsewhere are not seen until the local copy is invalidated
+    await redis_backend.delete(cache.build_key(random_string))
+    assert await cache.get(random_string) == Stats(1)
+    await cache.delete(random_string)
+    assert await cache.get(random_string) is None
+
+    await cache.set('a', 1)
+    await cache.set('b', 2)
+    assert len(local) == 2
+    await cache.purge()
+    assert len(local) == 0
+
+
+async def test_local_tier_backend_ttl(redis_backend, random_string):
+    writer = Cache(redis_backend, namespace='unittests')
+    reader = Cache(redis_backend, namespace='unittests', local=LocalCache(max_ttl=60))
+    a, b = f'{random_string}:a', f'{random_string}:b'
+
+    await writer.set(a, 'v', ttl=1)
+    await writer.set(b, 'w', ttl=1)
+    assert await reader.get(a) == 'v'
+    assert await reader.getmany([b]) == {b: 'w'}
+
+    # local copies read from the backend expire along with their keys there
+    await asyncio.sleep(1.1)
+    assert await reader.get(a) is None
+    assert await reader.getmany([b]) == {b: None}
+
+
+async def test_local_tier_broadcast(redis_backend, random_string):
+    a = Cache(redis_backend, namespace='unittests', local=LocalCache(), broadcast=True)
+    b = Cache(redis_backend, namespace='unittests', local=LocalCache(), broadcast=True)
+
+    await a.set(random_string, 1)
+    assert await a.get(random_string) == 1
+    assert await b.get(random_string) == 1
+    await asyncio.sleep(0.1)  # let both processes subscribe
+
+    await b.set(random_string, 2)
+    await asyncio.sleep(0.1)
+    assert await a.get(random_string) == 2
+
+    await b.delete(random_string)
+    await asyncio.sleep(0.1)
+    assert await a.get(random_string) is None
+
+    await a.close()
+    await b.close()
+
+
+async def test_local_tier_broadcast_survives_errors(redis_backend, random_string):
+    a = Cache(redis_backend, namespace='unittests', local=LocalCache(), broadcast=True)
+    b = Cache(redis_backend, namespace='unittests', local=LocalCache(), broadcast=True)
+
+    await a.set(random_string, 1)
+    assert await b.get(random_string) == 1
+    await asyncio.sleep(0.1)
+
+    # malformed messages are skipped without killing the listener
+    channel = b._invalidator.channel
+    await redis_backend.publish(channel, b'[1, 2]')
+    await redis_backend.publish(channel, b'not json')
+    await a.set(random_string, 2)
+    await asyncio.sleep(0.1)
+    assert not b._invalidator._listener.done()
+    assert await b.get(random_string) == 2
+
+    # a listener that stopped is started again
+    b._invalidator._listener.cancel()
+    await asyncio.sleep(0.01)
+    await b.get(random_string)
+    await asyncio.sleep(0.1)
+    await a.delete(random_string)
+    await asyncio.sleep(0.1)
+    assert await b.get(random_string) is None
+
+    await a.close()
+    await b.close()
+
+
+async def test_writes_not_serialized(cache: Cache, redis_backend, monkeypatch):
+    release = asyncio.Event()
+    original = redis_backend.set
+
+    async def slow_set(key, value, ttl=None, **kwargs):
+        if key.endswith(':blocked'):
+            await release.wait()
+        return await original(key, value, ttl=ttl, **kwargs)
+
+    monkeypatch.setattr(redis_backend, 'set', slow_set)
+
+    blocked = asyncio.ensure_future(cache.set('blocked', 1))
+    await asyncio.sleep(0.01)
+    assert await asyncio.wait_for(cache.set('other', 2), timeout=1)
+    assert not blocked.done()
+
+    release.set()
+    assert await blocked
+
+
+async def test_bulk_writes_not_serialized(memory_cache: Cache):
+    async with memory_cache.locks('busy'):
+        # a bulk write skips the per-key locks instead of holding most stripes
+        keys_vals = {f'key{i}': i for i in range(1000)}
+        assert await asyncio.wait_for(memory_cache.setmany(keys_vals), timeout=1) == 1000
+
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(memory_cache.setmany({'busy': 1}), timeout=0.1)
+
+
+async def test_getmany(cache: Cache, random_string):
+    await cache.setmany({f'{random_string}{i}': i for i in range(250)}, ttl=5)
+    keys = [f'{random_string}{i}' for i in range(300)]
+    missing = object()
+    found = await cache.getmany(keys, default=missing)
+    assert list(found) == keys
+    assert [found[k] for k in keys[:250]] == list(range(250))
+    assert all(found[k] is missing for k in keys[250:])
+
+
+async def test_decorator_many(cache: Cache, random_string):
+    calls = Counter()
+
+    @cache.cached(namespace=random_string, ttl=5, omit_self=False)
+    async def func(val: int):
+        calls[val] += 1
+        return val * 2
+
+    assert await func(1) == 2
+    assert await func.many([1, 2, (3,)]) == [2, 4, 6]
+    assert await func.many(range(4)) == [0, 2, 4, 6]
+    assert calls == {0: 1, 1: 1, 2: 1, 3: 1}
+
+
+async def test_decorator_many_refresh(memory_cache: Cache, random_string):
+    plugin = StatsPlugin()
+    memory_cache.add_plugin(plugin)
+    calls = Counter()
+
+    @memory_cache.cached(namespace=random_string, ttl=10, stale_ttl=1, omit_self=False)
+    async def func(val: int):
+        calls[val] += 1
+        return val + calls[val]
+
+    assert await func.many([1, 2]) == [2, 3]
+    assert plugin.stats.first_call > 0
+    assert plugin.stats.cache_types[int] == 2
+
+    # stale hits are served and refreshed in the background, as for single calls
+    await asyncio.sleep(1.1)
+    assert await func.many([1, 2]) == [2, 3]
+    await asyncio.sleep(0.05)
+    assert await func.many([1, 2]) == [3, 4]
+    assert plugin.stats.cache_types[int] == 6
+
+
+async def test_decorator_many_method(cache: Cache, random_string):
+    calls = Counter()
+
+    class Repo:
+
+        def __init__(self, scale: int):
+            self.scale = scale
+
+        @cache.cached(namespace=random_string, ttl=5)
+        async def get(self, val: int):
+            calls[val] += 1
+            return val * self.scale
+
+    repo = Repo(3)
+    assert await repo.get(1) == 3
+    # the instance is bound like a call, and left out of the key
+    assert await repo.get.many([1, 2, (4,)]) == [3, 6, 12]
+    assert await Repo.get.many([(repo, 5)]) == [15]
+    assert calls == {1: 1, 2: 1, 4: 1, 5: 1}
+    assert asyncio.iscoroutinefunction(repo.get)
+
+
+@pytest.mark.parametrize('ttl', [None, 1])
+async def test_setmany(cache: Cache, redis_backend, random_string, ttl):
+    keys_vals = {f'{random_string}{i}': i for i in range(250)}
+    assert await cache.setmany(keys_vals, ttl=ttl) == 250
+    assert await cache.getmany(keys_vals) == keys_vals
+
+    conn = await redis_backend.get_pool()
+    remaining = await conn.ttl(cache.build_key(f'{random_string}0'))
+    assert remaining == (ttl or -1)
+
+
+async def test_stale_while_revalidate(cache: Cache, random_string):
+    calls = Counter()
+
+    @cache.cached(namespace=random_string, ttl=10, stale_ttl=1)
+    async def func():
+        calls['func'] += 1
+        return calls['func']
+
+    assert await func() == 1
+    assert await func() == 1
+    await asyncio.sleep(1.1)
+    assert await func() == 1  # stale, refreshing in the background
+    await asyncio.sleep(0.1)
+    assert await func() == 2
+    assert calls['func'] == 2
+
+
+async def test_envelope_not_returned(memory_cache: Cache):
+
+    @memory_cache.cached(key='shared', stale_ttl=1)
+    async def stale():
+        return 4
+
+    @memory_cache.cached(key='shared')
+    async def plain():
+        return 5
+
+    # values written with an envelope read back bare everywhere
+    assert await stale() == 4
+    assert await plain() == 4
+    assert await plain.many([()]) == [4]
+    key = memory_cache.build_key('shared')
+    assert await memory_cache.get(key) == 4
+    assert await memory_cache.getmany([key]) == {key: 4}
+    assert await memory_cache.replace(key, 6) == 4
+
+
+async def test_close_cancels_refreshes(cache: Cache, random_string):
+    calls = Counter()
+    refreshing = asyncio.Event()
+
+    @cache.cached(namespace=random_string, ttl=10, stale_ttl=1)
+    async def func():
+        calls['func'] += 1
+        if calls['func'] > 1:
+            refreshing.set()
+            await asyncio.sleep(10)
+        return calls['func']
+
+    assert await func() == 1
+    await asyncio.sleep(1.1)
+    assert await func() == 1  # stale, refreshing in the background
+    await asyncio.wait_for(refreshing.wait(), 1)
+
+    fn_cache = next(iter(cache._fn_caches))
+    tasks = list(fn_cache._refreshes)
+    assert len(tasks) == 1
+
+    await asyncio.wait_for(cache.close(), 1)
+    assert tasks[0].cancelled()
+    assert not fn_cache._refreshes
+
+
+async def test_xfetch(cache: Cache, random_string, monkeypatch):
+    monkeypatch.setattr('aiocacher.cache.random.random', lambda: 0.5)
+    calls = Counter()
+
+    @cache.cached(namespace=random_string, ttl=5, xfetch=1000)
+    async def func():
+        calls['func'] += 1
+        await asyncio.sleep(0.05)
+        return calls['func']
+
+    assert await func() == 1
+    assert await func() == 1  # expensive enough to refresh early
+    await asyncio.sleep(0.1)
+    assert await func() == 2
+
+
+@pytest.mark.parametrize('serializer', [
+    PickleSerializer,
+    DillSerializer,
+    JsonSerializer,
+    OrjsonSerializer,
+    pytest.param(MsgpackSerializer, marks=pytest.mark.skipif(
+        msgpack is None, reason='msgpack is not installed')),
+    lambda: CompressedSerializer(JsonSerializer(), threshold=16),
+])
+async def test_envelope_serializers(memory_backend: MemoryBackend, serializer):
+    cache = Cache(memory_backend, namespace='unittests', serializer=serializer())
+    calls = Counter()
+
+    @cache.cached(namespace='envelope', ttl=10, stale_ttl=5, xfetch=1.0, omit_self=False)
+    async def func(val: int):
+        calls[val] += 1
+        return {'val': [val, 'x' * 20]}
+
+    assert await func(1) == {'val': [1, 'x' * 20]}
+    assert await func(1) == {'val': [1, 'x' * 20]}
+    assert await func.many([1, 2]) == [{'val': [1, 'x' * 20]}, {'val': [2, 'x' * 20]}]
+    assert calls == {1: 1, 2: 1}
+
+    # the metadata is a header in front of the serializer's own output
+    assert all(raw[:2] == ENVELOPE for raw, _ in memory_backend._data.values())
+
+
+async def test_offload_process_pool(memory_backend: MemoryBackend):
+    serializer = CompressedSerializer(PickleSerializer(), threshold=256)
+
+    with ProcessPoolExecutor(1) as executor:
+        # start the worker outside of the cache's timeout
+        executor.submit(int).result()
+        cache = Cache(memory_backend, serializer=serializer, offload_threshold=1000, executor=executor)
+        value = ['x' * 100 for _ in range(100)]
+
+        await cache.set('large', value)
+        assert (await memory_backend.get(cache.build_key('large')))[:2] == b'\xc1\x01'
+        assert await cache.get('large') == value
+
+
+async def test_generations(memory_backend: MemoryBackend):
+    a = Cache(memory_backend, namespace='unittests', generations=True, generation_ttl=0.1)
+    b = Cache(memory_backend, namespace='unittests', generations=True, generation_ttl=0.1)
+    calls = []
+
+    async def func(val: int):
+        calls.append(val)
+        return len(calls)
+
+    fa = a.cached(namespace='gens', omit_self=False)(func)
+    fb = b.cached(namespace='gens', omit_self=False)(func)
+
+    assert await fa(1) == 1
+    assert await fb(1) == 1
+    # clearing is one INCR, the old keys are left to expire
+    await a.set('gens:plain', 1)
+    assert await a.clear_namespace('gens') == 0
+    assert len(memory_backend) == 3
+    assert await fa(1) == 2
+    # the other process picks up the new generation once its copy is stale
+    await asyncio.sleep(0.15)
+    assert await fb(1) == 2
+    assert calls == [1, 1]
+
+    # keys written without a generation are only reached by a scan
+    assert await a.get('gens:plain') == 1
+    assert await a.clear_namespace('gens', scan=True) == 3
+    assert await a.get('gens:plain') is None
+
+
+async def test_generation_fetch_times_out():
+
+    class Slow(MemoryBackend):
+
+        async def get(self, key, **kwargs):
+            await asyncio.sleep(5)
+
+    cache = Cache(Slow(), namespace='unittests', generations=True, global_timeout=1)
+
+    @cache.cached(namespace='gens')
+    async def func():
+        return 1
+
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(func(), 3)
+
+
+@pytest.mark.parametrize('namespace', ['unittests', None])
+async def test_long_keys(memory_backend: MemoryBackend, namespace):
+    cache = Cache(memory_backend, namespace=namespace)
+    a, b = 'report:' + 'x' * 100 + 'a', 'report:' + 'x' * 100 + 'b'
+
+    # keys sharing a long prefix no longer collide once shortened
+    await cache.set(a, 'a')
+    await cache.set(b, 'b')
+    assert await cache.getmany([a, b]) == {a: 'a', b: 'b'}
+    assert await cache.clear_namespace('report') == 2
+    assert await cache.get(a) is None
+
+    # long namespaces are never cut, so their keys can still be cleared
+    @cache.cached(key='k' * 100, namespace='n' * 100)
+    async def func():
+        return 1
+
+    await func()
+    assert await cache.clear_namespace('n' * 100) == 1
+
+
+async def test_timeout():
+
+    class Stalled(MemoryBackend):
+
+        async def get(self, key: str, **kwargs):
+            await asyncio.sleep(10)
+
+    cache = Cache(Stalled(), global_timeout=1)
+    with pytest.raises(asyncio.TimeoutError):
+        await cache.get('a')
+
+    # the task can carry on, and cancelling it from outside is not a timeout
+    assert await cache.set('a', 1)
+    task = asyncio.ensure_future(cache.get('a'))
+    await asyncio.sleep(0.01)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+
+async def test_timeout_racing_cancel():
+
+    class Stalled(MemoryBackend):
+
+        async def get(self, key: str, **kwargs):
+            await asyncio.sleep(10)
+
+    cache = Cache(Stalled(), global_timeout=1)
+    task = asyncio.ensure_future(cache.get('a'))
+    await asyncio.sleep(0)
+    # an outside cancel landing with the deadline is not swallowed as a timeout
+    asyncio.get_running_loop().call_later(1, task.cancel)
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+
+async def test_offload(memory_backend: MemoryBackend):
+
+    class Counting(ThreadPoolExecutor):
+        submitted = 0
+
+        def submit(self, *args, **kwargs):
+            Counting.submitted += 1
+            return super().submit(*args, **kwargs)
+
+    with Counting(2) as executor:
+        cache = Cache(memory_backend, offload_threshold=1000, executor=executor)
+        small, large = 'x' * 10, 'x' * 2000
+
+        await cache.set('small', small)
+        assert Counting.submitted == 0
+        await cache.set('large', large)
+        assert Counting.submitted == 1
+        assert await cache.get('small') == small
+        assert await cache.get('large') == large
+        assert Counting.submitted == 2
+
+        # sizes of other types are learned from the first value written
+        lists = {f'list-{n}': [str(i) * 50 for i in range(n)] for n in (1, 100, 200)}
+        await cache.setmany(lists)
+        assert Counting.submitted == 4
+        found = await cache.getmany(['small', 'large', 'list-1', 'list-200'])
+        assert found['large'] == large and found['list-200'] == lists['list-200']
+        assert Counting.submitted == 6
+
+
+async def test_negative_caching(memory_backend: MemoryBackend):
+    cache = Cache(memory_backend, namespace='unittests')
+    calls = []
+
+    async def lookup(user_id: int):
+        calls.append(user_id)
+        return None if user_id < 0 else user_id
+
+    cached = cache.cached(namespace='neg', ttl=10, negative_ttl=1, omit_self=False)(lookup)
+    uncached = cache.cached(namespace='pos', ttl=10, cache_none=False, omit_self=False)(lookup)
+
+    assert [await cached(-1) for _ in range(3)] == [None] * 3
+    assert await cached.many([-1, -2]) == [None, None]
+    assert calls == [-1, -2]
+
+    # the tombstone tells a stored None from a missing key
+    await cache.set('none', None)
+    assert await memory_backend.get(cache.build_key('none')) == TOMBSTONE
+    assert await cache.get('none', default='default') is None
+    assert (await cache.getmany(['none', 'missing'], default='default')) == {
+        'none': None,
+        'missing': 'default',
+    }
+
+    # negative results expire on their own TTL
+    await asyncio.sleep(1.1)
+    assert await cached(-1) is None
+    assert calls == [-1, -2, -1]
+
+    calls.clear()
+    assert [await uncached(-1) for _ in range(2)] == [None, None]
+    assert calls == [-1, -1]
+
+
+async def test_dynamic_ttl(memory_backend: MemoryBackend):
+    cache = Cache(memory_backend, namespace='unittests')
+    calls = []
+
+    async def lookup(val: int):
+        calls.append(val)
+        await asyncio.sleep(0.01 * val)
+        return val
+
+    # expensive results live longer than cheap ones
+    ttl = cache.cached(
+        namespace='ttl',
+        ttl=lambda result, elapsed: 10 if elapsed >= 0.02 else 1,
+        omit_self=False,
+    )(lookup)
+
+    assert await ttl(0) == 0
+    assert await ttl.many([0, 3]) == [0, 3]
+    assert calls == [0, 3]
+    await asyncio.sleep(1.1)
+    assert await ttl.many([0, 3]) == [0, 3]
+    assert calls == [0, 3, 0]
+
+
+async def test_ttl_jitter(memory_backend: MemoryBackend):
+    cache = Cache(memory_backend)
+    fn_cache = cache.cached(ttl=100, ttl_jitter=0.2)
+
+    ttls = {fn_cache._ttl_for(1, 0.0) for _ in range(200)}
+    assert min(ttls) >= 80 and max(ttls) <= 120 and len(ttls) > 10
+
+    with pytest.raises(RuntimeError):
+        cache.cached(ttl=1, ttl_jitter=1.0)
+
+
+async def test_write_behind():
+
+    class Counting(MemoryBackend):
+        batches = []
+
+        async def setmany(self, keys_vals, ttl, **kwargs):
+            Counting.batches.append(sorted(keys_vals))
+            await asyncio.sleep(0.01)
+            return await super().setmany(keys_vals, ttl, **kwargs)
+
+    backend = Counting()
+    cache = Cache(backend, namespace='unittests', max_pending_writes=3)
+
+    @cache.cached(namespace='wb', wait_for_write=False, omit_self=False)
+    async def func(val: int):
+        return val
+
+    # misses within the delay are written together, with one setmany
+    assert [await func(v) for v in range(3)] == [0, 1, 2]
+    assert len(backend) == 0
+    await asyncio.sleep(0.05)
+    assert len(Counting.batches) == 1 and len(backend) == 3
+
+    # a full queue waits for the batch in flight, superseded writes are dropped
+    Counting.batches.clear()
+    assert await func.many(range(10, 15)) == list(range(10, 15))
+    await cache.set('x', 1)
+    await cache._write_behind.put('x', 2, None)
+    await cache._write_behind.put('x', 3, None)
+    assert cache._write_behind.superseded == 1
+
+    await cache.close()
+    assert not cache._write_behind
+    assert all(len(batch) <= 3 for batch in Counting.batches)
+    assert len(backend) == 9
+    assert await cache.get('x') == 3
+
+
+async def test_write_behind_discard():
+    release = asyncio.Event()
+
+    class Stalled(MemoryBackend):
+
+        async def setmany(self, keys_vals, ttl, **kwargs):
+            await release.wait()
+            return await super().setmany(keys_vals, ttl, **kwargs)
+
+    backend = Stalled()
+    cache = Cache(backend, namespace='unittests')
+    await cache._write_behind.put('ns:a', 1, None)
+    await cache._write_behind.put('ns:b', 2, None)
+    await asyncio.sleep(0.02)  # the batch is taken and being written
+
+    # removing keys waits for the batch in flight instead of racing it
+    deleted = asyncio.ensure_future(cache.delete('ns:a'))
+    cleared = asyncio.ensure_future(cache.clear_namespace('ns'))
+    await asyncio.sleep(0.01)
+    assert not deleted.done() and not cleared.done()
+
+    release.set()
+    await deleted
+    await cleared
+    assert await cache.getmany(['ns:a', 'ns:b']) == {'ns:a': None, 'ns:b': None}
+
+
+async def test_write_behind_delete_before_batch_runs():
+    cache = Cache(MemoryBackend(), namespace='unittests', global_timeout=1)
+    await cache._write_behind.put('ns:b', 1, None)
+    cache._write_behind._start()  # the batch task exists but has not run yet
+
+    # the batch's ``setmany`` needs the key's lock, so ``delete`` must not hold it
+    #  while waiting for the batch
+    assert await cache.delete('ns:b')
+    assert await cache.get('ns:b') is None
@@ -0,0 +1,93 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   async-redis-cache, 2021
+#   LiveViewTech
+# <<
+
+import asyncio
+
+import pytest
+
+from aiocacher.cache import Cache
+from aiocacher.backends.memory import MemoryBackend
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_ttl(memory_backend: MemoryBackend):
+    await memory_backend.set('a', b'1', ttl=1)
+    await memory_backend.set('b', b'2', ttl=None)
+    await memory_backend.setmany({'c': b'3', 'd': b'4'}, ttl=1)
+    assert await memory_backend.getmany(['a', 'b', 'c', 'x']) == [b'1', b'2', b'3', None]
+    (a, ttl), b, x = await memory_backend.getmany_ttl(['a', 'b', 'x'])
+    assert a == b'1' and 0.9 < ttl <= 1
+    assert b == (b'2', None) and x == (None, None)
+
+    # rewriting with a new TTL outlives the first expiry
+    await memory_backend.set('c', b'5', ttl=3)
+    await asyncio.sleep(1.1)
+    assert len(memory_backend) == 2
+    assert await memory_backend.getmany(['a', 'b', 'c', 'd']) == [None, b'2', b'5', None]
+
+    assert await memory_backend.expire('b', 0)
+    assert await memory_backend.get('b') is None
+
+
+async def test_replace_and_delete(memory_backend: MemoryBackend):
+    assert await memory_backend.replace('a', b'1', ttl=None) is None
+    assert await memory_backend.replace('a', b'2', ttl=None) == b'1'
+    assert await memory_backend.delete('a')
+    assert not await memory_backend.delete('a')
+
+
+async def test_max_entries():
+    backend = MemoryBackend(max_entries=3)
+    for k in 'abc':
+        await backend.set(k, k.encode(), ttl=None)
+    await backend.get('a')
+    await backend.set('d', b'd', ttl=None)
+    assert await backend.getmany(['a', 'b', 'c', 'd']) == [b'a', None, b'c', b'd']
+
+
+async def test_clear_namespace(memory_cache: Cache):
+
+    @memory_cache.cached(namespace='inside', omit_self=False)
+    async def func(val: str):
+        return val
+
+    for val in 'abc':
+        await func(val)
+    await memory_cache.set('inside', 1)
+
+    assert await memory_cache.clear_namespace('outside') == 0
+    assert await memory_cache.clear_namespace('inside') == 3
+    assert await memory_cache.get('inside') == 1
+
+
+async def test_clear_nested_namespace(memory_cache: Cache):
+    await memory_cache.setmany({'a:b:1': 1, 'a:b:2': 2, 'a:c:1': 3, 'a:bc:1': 4})
+
+    # deeper than the prefix index, as Redis' SCAN would match
+    assert await memory_cache.clear_namespace('a:b') == 2
+    assert await memory_cache.getmany(['a:b:1', 'a:c:1', 'a:bc:1']) == {
+        'a:b:1': None,
+        'a:c:1': 3,
+        'a:bc:1': 4,
+    }
+    assert await memory_cache.clear_namespace('a') == 2
+
+
+async def test_locks(memory_backend: MemoryBackend):
+    assert await memory_backend.acquire_lock('lock', 'a', ttl=1)
+    assert not await memory_backend.acquire_lock('lock', 'b', ttl=1)
+    assert not await memory_backend.release_lock('lock', 'b')
+    assert await memory_backend.release_lock('lock', 'a')
+    assert await memory_backend.acquire_lock('lock', 'b', ttl=1)
+
+
+async def test_setmany_ttls(memory_backend: MemoryBackend):
+    await memory_backend.setmany({'a': b'1', 'b': b'2'}, ttl={'a': 1})
+    await asyncio.sleep(1.1)
+    assert await memory_backend.getmany(['a', 'b']) == [None, b'2']
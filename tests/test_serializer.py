@@ -6,13 +6,32 @@
 #   LiveViewTech
 # <<
 
+import pickle
 import random
 from dataclasses import dataclass
 from typing import Optional
 
 import pytest
 
-from aiocacher.serializers import DillSerializer, JsonSerializer, PickleSerializer
+try:
+    import msgpack
+
+except ImportError:
+    msgpack = None
+
+from aiocacher.serializers import (
+    CompressedSerializer,
+    DillSerializer,
+    JsonSerializer,
+    MsgpackSerializer,
+    OrjsonSerializer,
+    PickleSerializer,
+    train_dictionary,
+)
+from aiocacher.serializers import compression
+
+requires_zstd = pytest.mark.skipif(compression.zstandard is None, reason='zstandard is not installed')
+requires_lz4 = pytest.mark.skipif(compression.lz4 is None, reason='lz4 is not installed')
 
 
 @dataclass(unsafe_hash=True)
@@ -30,10 +49,17 @@ class Stats:
         return cls(a=a, b=b, c=c)
 
 
+# factories, so optional serializers are only built when their package is installed
 @pytest.mark.parametrize('serializer', [
-    PickleSerializer(),
-    DillSerializer(),
-    JsonSerializer(),
+    PickleSerializer,
+    lambda: PickleSerializer(protocol=5, oob_threshold=0),
+    DillSerializer,
+    JsonSerializer,
+    OrjsonSerializer,
+    pytest.param(
+        MsgpackSerializer,
+        marks=pytest.mark.skipif(msgpack is None, reason='msgpack is not installed'),
+    ),
 ])
 @pytest.mark.parametrize('ins', [
     1,
@@ -46,15 +72,88 @@ class Stats:
     {'a': ['b', {'c': None}]},
 ])
 def test_serializer(serializer, ins):
+    serializer = serializer()
     x = serializer.dumps(ins)
     assert serializer.loads(x) == ins, x
 
 
 @pytest.mark.parametrize('serializer', [
     PickleSerializer(),
+    PickleSerializer(protocol=5, oob_threshold=0),
     DillSerializer(),
 ])
 @pytest.mark.parametrize('ins', [Stats.gen() for _ in range(10)])
 def test_binary_serializers_dataclass(serializer, ins):
     x = serializer.dumps(ins)
     assert serializer.loads(x) == ins, x
+
+
+class Buffer(bytearray):
+    """Reduces to a PickleBuffer at protocol 5, like numpy arrays do."""
+
+    def __reduce_ex__(self, protocol):
+        if protocol >= 5:
+            return type(self)._reconstruct, (pickle.PickleBuffer(self),)
+        return type(self), (bytearray(self),)
+
+    @classmethod
+    def _reconstruct(cls, obj):
+        with memoryview(obj) as m:
+            return cls(m)
+
+
+@pytest.mark.parametrize('ins', [
+    Buffer(1024 * 1024),
+    [Buffer(b'a' * 100), Buffer(b'b' * 10), 'c'],
+])
+def test_pickle_out_of_band(ins):
+    serializer = PickleSerializer(protocol=5, oob_threshold=50)
+    x = serializer.dumps(ins)
+    assert x[0] == 0x81
+    assert serializer.loads(x) == ins
+    assert serializer.loads(memoryview(x)) == ins
+
+
+@pytest.mark.parametrize('codec', [
+    'zlib',
+    pytest.param('lz4', marks=requires_lz4),
+    pytest.param('zstd', marks=requires_zstd),
+])
+@pytest.mark.parametrize('ins', [
+    'small',
+    'large' * 1000,
+    [Stats.gen() for _ in range(100)],
+])
+def test_compressed_serializer(codec, ins):
+    inner = DillSerializer()
+    serializer = CompressedSerializer(inner, threshold=256, codec=codec)
+    x = serializer.dumps(ins)
+    assert x[0] == 0xC1
+    assert len(x) <= len(inner.dumps(ins)) + 2
+    assert serializer.loads(x) == ins
+    # values stored before compression was enabled stay readable
+    assert serializer.loads(inner.dumps(ins)) == ins
+
+
+@pytest.mark.parametrize('codec', ['zlib', pytest.param('zstd', marks=requires_zstd)])
+def test_compressed_serializer_pickles(codec):
+    serializer = CompressedSerializer(DillSerializer(), threshold=16, codec=codec)
+    serializer.dumps('warm up the per-thread codecs' * 10)
+    copy = pickle.loads(pickle.dumps(serializer))
+    assert copy.loads(serializer.dumps('abc' * 100)) == 'abc' * 100
+
+
+@requires_zstd
+def test_compressed_serializer_dictionary():
+    inner = JsonSerializer()
+    samples = [inner.dumps({'id': i, 'name': f'user-{i}', 'active': bool(i % 2)}) for i in range(500)]
+    serializer = CompressedSerializer(
+        inner,
+        threshold=16,
+        codec='zstd',
+        dictionary=train_dictionary(samples, size=1024),
+    )
+    ins = {'id': 1000, 'name': 'user-1000', 'active': False}
+    x = serializer.dumps(ins)
+    assert len(x) < len(inner.dumps(ins))
+    assert serializer.loads(x) == ins
@@ -0,0 +1,58 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   async-redis-cache, 2021
+#   LiveViewTech
+# <<
+
+import pytest
+
+from aiocacher.cache import Cache
+from aiocacher.backends.memory import MemoryBackend
+from aiocacher.backends.sharded import ShardedBackend
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_sharded():
+    nodes = [MemoryBackend() for _ in range(3)]
+    cache = Cache(ShardedBackend(nodes), namespace='unittests')
+
+    await cache.setmany({str(i): i for i in range(300)})
+    assert all(len(node) > 50 for node in nodes)
+    assert sum(len(node) for node in nodes) == 300
+
+    found = await cache.getmany([str(i) for i in range(300)])
+    assert list(found.values()) == list(range(300))
+    key = cache.build_key('7')
+    assert await cache._backend.getmany_ttl([key]) == [(await cache._backend.get(key), None)]
+    assert await cache.get('150') == 150
+
+
+async def test_sharded_clear_namespace(redis_backend):
+    nodes = {'memory': MemoryBackend(), 'redis': redis_backend}
+    cache = Cache(ShardedBackend(nodes), namespace='unittests')
+
+    @cache.cached(ttl=5, namespace='sharded', omit_self=False)
+    async def func(val: int):
+        return val
+
+    for i in range(20):
+        await func(i)
+
+    assert len(nodes['memory']) < 20
+    assert await cache.clear_namespace('sharded') == 20
+
+
+async def test_sharded_membership():
+    backend = ShardedBackend({'a': MemoryBackend(), 'b': MemoryBackend()})
+    keys = [f'key{i}' for i in range(1000)]
+    await backend.setmany({k: b'1' for k in keys}, ttl=None)
+
+    node = MemoryBackend()
+    backend.add_node('c', node)
+    found = await backend.getmany(keys)
+    moved = [k for k, v in zip(keys, found) if v is None]
+    assert 200 < len(moved) < 450  # roughly a third of the keys
+    assert all(backend.backend_for(k) is node for k in moved)
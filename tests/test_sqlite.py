@@ -0,0 +1,77 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   async-redis-cache, 2021
+#   LiveViewTech
+# <<
+
+import asyncio
+
+import pytest
+
+from aiocacher.cache import Cache
+from aiocacher.backends.sqlite import SQLiteBackend
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture(scope='function')
+@pytest.mark.asyncio
+async def sqlite_backend(tmp_path):
+    o = SQLiteBackend(str(tmp_path / 'cache.db'))
+    yield o
+    await o.close()
+
+
+async def test_persistence(tmp_path, sqlite_backend: SQLiteBackend):
+    cache = Cache(sqlite_backend, namespace='unittests')
+    await cache.set('a', {'a': 1})
+    await cache.setmany({'b': 2, 'c': 3}, ttl=60)
+    await cache.close()
+
+    # a new process pointed at the same file starts warm
+    other = Cache(SQLiteBackend(str(tmp_path / 'cache.db')), namespace='unittests')
+    assert await other.getmany(['a', 'b', 'c', 'd']) == {'a': {'a': 1}, 'b': 2, 'c': 3, 'd': None}
+    assert await other.replace('b', 4) == 2
+    assert await other.get('b') == 4
+    await other.close()
+
+
+async def test_ttl(sqlite_backend: SQLiteBackend):
+    await sqlite_backend.set('a', b'1', ttl=1)
+    await sqlite_backend.set('b', b'2', ttl=None)
+    assert await sqlite_backend.expire('b', 1)
+    assert not await sqlite_backend.expire('x', 1)
+    assert await sqlite_backend.getmany(['a', 'b']) == [b'1', b'2']
+    (a, ttl), x = await sqlite_backend.getmany_ttl(['a', 'x'])
+    assert a == b'1' and 0.9 < ttl <= 1
+    assert x == (None, None)
+    await asyncio.sleep(1.1)
+    assert await sqlite_backend.getmany(['a', 'b']) == [None, None]
+    assert not await sqlite_backend.delete('a')
+
+
+async def test_clear_namespace(sqlite_backend: SQLiteBackend):
+    cache = Cache(sqlite_backend, namespace='unittests')
+
+    @cache.cached(namespace='inside', omit_self=False)
+    async def func(val: str):
+        return val
+
+    for val in 'abc':
+        await func(val)
+    await cache.set('inside', 1)
+    await cache.set('inside;', 1)
+
+    assert await cache.clear_namespace('outside') == 0
+    assert await cache.clear_namespace('inside') == 3
+    assert await cache.getmany(['inside', 'inside;']) == {'inside': 1, 'inside;': 1}
+
+
+async def test_locks(sqlite_backend: SQLiteBackend):
+    assert await sqlite_backend.acquire_lock('lock', 'a', ttl=1)
+    assert not await sqlite_backend.acquire_lock('lock', 'b', ttl=1)
+    assert not await sqlite_backend.release_lock('lock', 'b')
+    assert await sqlite_backend.release_lock('lock', 'a')
+    assert await sqlite_backend.acquire_lock('lock', 'b', ttl=1)
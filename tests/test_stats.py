@@ -0,0 +1,160 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   async-redis-cache, 2021
+#   LiveViewTech
+# <<
+
+import asyncio
+
+import pytest
+
+from aiocacher.cache import Cache
+from aiocacher.backends.memory import MemoryBackend
+from aiocacher.plugins.stats import StatsPlugin
+from aiocacher.plugins.analytics import AnalyticsPlugin
+
+pytestmark = pytest.mark.asyncio
+
+
+class Instrument:
+
+    def __init__(self):
+        self.points = []
+
+    def record(self, value, attributes):
+        self.points.append((value, attributes))
+
+    add = record
+
+
+class Meter:
+
+    def __init__(self):
+        self.instruments = {}
+
+    def create_histogram(self, name, **kwargs):
+        return self.instruments.setdefault(name, Instrument())
+
+    create_counter = create_histogram
+
+
+async def test_hit_ratio_without_calls():
+    assert StatsPlugin().stats.hit_ratio == 0.0
+
+
+async def test_operations(memory_cache: Cache):
+    plugin = StatsPlugin()
+    memory_cache.add_plugin(plugin)
+
+    await memory_cache.set('a', 'x' * 100)
+    await memory_cache.setmany({'b': 1, 'c': 2})
+    assert await memory_cache.get('a') == 'x' * 100
+    await memory_cache.get('missing')
+
+    ops = plugin.stats.operations
+    assert set(ops) == {'set', 'setmany', 'get'}
+    assert ops['get'].calls == 2
+    assert ops['set'].bytes_out > 100
+    assert ops['get'].bytes_in == ops['set'].bytes_out
+    assert ops['get'].latency['total'].count == 2
+    assert ops['get'].latency['total'].sum >= ops['get'].latency['backend'].sum
+
+    text = plugin.prometheus()
+    assert 'aiocacher_operations_total{op="get"} 2' in text
+    assert 'aiocacher_operation_duration_seconds_count{op="set",phase="total"} 1' in text
+    assert 'aiocacher_operation_duration_seconds_bucket{op="get",phase="total",le="+Inf"} 2' in text
+
+
+async def test_timeouts():
+
+    class Stalled(MemoryBackend):
+
+        async def get(self, key: str, **kwargs):
+            await asyncio.sleep(10)
+
+    meter = Meter()
+    plugin = StatsPlugin(meter=meter)
+    cache = Cache(Stalled(), global_timeout=1, plugins=[plugin])
+
+    with pytest.raises(asyncio.TimeoutError):
+        await cache.get('a')
+
+    assert plugin.stats.operations['get'].timeouts == 1
+    assert meter.instruments['aiocacher.operation.failures'].points == [
+        (1, {'op': 'get', 'reason': 'timeout'}),
+    ]
+
+
+async def test_analytics(memory_cache: Cache):
+    plugin = AnalyticsPlugin(top_keys=3, max_namespaces=2)
+    memory_cache.add_plugin(plugin)
+
+    @memory_cache.cached(namespace='users', omit_self=False)
+    async def user(user_id: int):
+        await asyncio.sleep(0.01)
+        return {'id': user_id, 'name': 'x' * user_id}
+
+    for user_id in (1, 1, 1, 2, 3, 3, 1000):
+        await user(user_id)
+    await memory_cache.set('other:a', 1)
+    await memory_cache.set('third:a', 1)
+
+    snap = plugin.snapshot()
+    assert snap['hot_keys'][0]['count'] == 3
+    assert len(snap['hot_keys']) == 3
+
+    users = snap['namespaces']['users']
+    assert (users['hits'], users['misses']) == (3, 4)
+    assert users['sizes']['count'] == 4
+    assert users['sizes']['p99'] >= 1000
+    assert set(snap['namespaces']) == {'users', 'other', '<other>'}
+
+    (name, fn), = snap['functions'].items()
+    assert name.endswith('test_analytics.<locals>.user')
+    assert fn['misses'] == 4
+    assert fn['miss_cost']['sum'] >= 0.04
+
+    # batched writes are sized per key too
+    await user.many([4, 5])
+    assert plugin.snapshot()['namespaces']['users']['sizes']['count'] == 6
+
+
+async def test_sync_and_async_hooks(memory_cache: Cache):
+    calls = []
+
+    class Sync:
+
+        def on_cache_miss(self, key: str):
+            calls.append(('sync miss', key))
+
+        def after_call(self, result):
+            return result + 1
+
+    class Async:
+
+        async def on_cache_hit(self, key: str):
+            await asyncio.sleep(0)
+            calls.append(('async hit', key))
+
+        async def after_call(self, result):
+            return result * 10
+
+    memory_cache.add_plugin(Sync())
+    assert memory_cache._async_hooks == set()
+    memory_cache.add_plugin(Async())
+    assert memory_cache._async_hooks == {'on_cache_hit', 'after_call'}
+
+    @memory_cache.cached(key='k', namespace='hooks')
+    async def func():
+        return 1
+
+    assert await func() == 20
+    assert await func() == 20
+    assert calls == [('sync miss', 'hooks:k'), ('async hit', 'hooks:k')]
+
+    # the plugin list can't be changed behind ``add_plugin``'s back
+    assert memory_cache.plugins == tuple(memory_cache._plugins)
+    with pytest.raises(AttributeError):
+        memory_cache.plugins.append(Sync())
@@ -0,0 +1,72 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   async-redis-cache, 2021
+#   LiveViewTech
+# <<
+
+from time import monotonic
+
+import pytest
+
+from aiocacher.cache import Cache
+from aiocacher.local import LocalCache
+from aiocacher.backends.memory import MemoryBackend
+from aiocacher.warmup import Recording, Warmup, WarmupPlugin
+
+pytestmark = pytest.mark.asyncio
+
+calls = []
+
+
+async def square(val: int) -> int:
+    calls.append(val)
+    return val * val
+
+
+async def test_record_and_replay(tmp_path):
+    recorder = WarmupPlugin(top_keys=2)
+    backend = MemoryBackend()
+    cache = Cache(backend, namespace='unittests', plugins=[recorder])
+    func = cache.cached(namespace='squares', omit_self=False)(square)
+
+    for val in [1, 2, 2, 3, 3, 3]:
+        await func(val)
+
+    path = str(tmp_path / 'warmup.bin')
+    assert recorder.recording().save(path) == 2
+    recording = Recording.load(path)
+    assert len(recording.keys) == 2 and len(recording.calls) == 2
+
+    await cache.purge()
+    calls.clear()
+    progress = []
+    warmup = Warmup(cache, concurrency=1, rate=20, progress=lambda *p: progress.append(p))
+
+    start = monotonic()
+    assert await warmup.replay(recording, [func]) == 2
+    assert monotonic() - start >= 0.05
+    assert sorted(calls) == [2, 3]
+    assert progress == [(1, 2), (2, 2)]
+
+    # the replayed values are hits now
+    await func(3)
+    assert sorted(calls) == [2, 3]
+
+
+async def test_preload():
+    backend = MemoryBackend()
+    writer = Cache(backend, namespace='unittests')
+    await writer.setmany({'a': 1, 'b': 2})
+
+    cache = Cache(backend, namespace='unittests', local=LocalCache(max_entries=10))
+    warmup = Warmup(cache, concurrency=2)
+    assert await warmup.preload(Recording(['a', 'b', 'c'], []), batch_size=2) == 2
+
+    # served from the local tier without touching the backend
+    await backend.purge()
+    assert await cache.getmany(['a', 'b']) == {'a': 1, 'b': 2}
+
+    with pytest.raises(RuntimeError):
+        await Warmup(writer).preload(Recording([], []))